@@ -3,21 +3,72 @@ Application Flask pour le Chatbot Touristique Tunis
 Connecte le backend Python avec l'interface web
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g
 from flask_cors import CORS
+import hmac
 import json
+import os
+import re
+import uuid
 
 # Importer notre chatbot
 from tunis_chatbot import TunisChatbot
+from history_store import SessionHistoryStore
+from serving import ChatStream
+from tracing import profiled, profiler_from_header
 
 app = Flask(__name__)
 CORS(app)  # Permettre les requêtes cross-origin
 
 # Initialiser le chatbot
 print("Initialisation du chatbot...")
-bot = TunisChatbot()
+bot = TunisChatbot(
+    history_store=SessionHistoryStore(
+        max_messages=int(os.environ.get('TUNISBOT_HISTORY_MAX_MESSAGES', 100)),
+        idle_ttl=int(os.environ.get('TUNISBOT_HISTORY_IDLE_TTL', 1800)),
+        memory_budget=int(os.environ.get('TUNISBOT_HISTORY_MEMORY_BUDGET', 64 * 1024 * 1024)),
+        spill_path=os.environ.get('TUNISBOT_HISTORY_SPILL_PATH')
+    ),
+    watch_interval=float(os.environ.get('TUNISBOT_KB_WATCH_INTERVAL', 0)) or None,
+    embedding_precision=os.environ.get('TUNISBOT_EMBEDDING_PRECISION', 'float32'),
+    rerank_k=int(os.environ.get('TUNISBOT_RERANK_K', 0))
+)
 print("Chatbot prêt!")
 
+# Renseigné par asgi.py en mode production
+inference_service = None
+
+SESSION_COOKIE = 'tunisbot_session'
+SESSION_HEADER = 'X-Session-Id'
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Endpoints d'administration désactivés tant qu'aucun jeton n'est configuré
+ADMIN_TOKEN = os.environ.get('TUNISBOT_ADMIN_TOKEN')
+ADMIN_HEADER = 'X-Admin-Token'
+# Profilage d'une requête /api/chat: X-Profile: cprofile|sampling (+ jeton)
+PROFILE_HEADER = 'X-Profile'
+
+def get_session_id():
+    """Session de l'appelant (en-tête ou cookie), créée si absente"""
+    if 'session_id' not in g:
+        session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        if not session_id or not SESSION_ID_RE.match(session_id):
+            session_id = uuid.uuid4().hex
+            g.new_session = True
+        g.session_id = session_id
+    return g.session_id
+
+def is_admin():
+    """Jeton d'administration configuré et fourni par l'appelant"""
+    token = request.headers.get(ADMIN_HEADER, '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+@app.after_request
+def set_session_cookie(response):
+    if g.get('new_session'):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite='Lax')
+    return response
+
 @app.route('/')
 def home():
     """Page d'accueil"""
@@ -36,13 +87,21 @@ def chat():
                 'error': 'Message vide'
             }), 400
         
-        # Obtenir la réponse du chatbot
-        response, method = bot.chat(user_message)
+        # Obtenir la réponse du chatbot (profilée si demandé par un administrateur)
+        session_id = get_session_id()
+        profiler = profiler_from_header(request.headers.get(PROFILE_HEADER))
+        if profiler and is_admin():
+            result, profile = profiled(profiler, bot.chat_details, user_message, session_id)
+            result.metadata['profile'] = profile
+        else:
+            result = bot.chat_details(user_message, session_id)
         
         return jsonify({
             'success': True,
-            'response': response,
-            'method': method,
+            'session_id': session_id,
+            'response': result.response,
+            'method': result.method,
+            'metadata': result.metadata,
             'timestamp': None
         })
     
@@ -52,18 +111,65 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat en Server-Sent Events: réponse règles/TF-IDF immédiate,
+    éventuel upgrade par les embeddings, texte envoyé par morceaux"""
+    data = request.get_json(silent=True) or {}
+    user_message = str(data.get('message', '')).strip()
+    if not user_message:
+        return jsonify({
+            'success': False,
+            'error': 'Message vide'
+        }), 400
+    
+    stream = ChatStream(bot, user_message, get_session_id())
+    return Response(stream.events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Sonde de disponibilité: état de chaque niveau de recherche
+
+    ?require=embedding renvoie 503 tant que le niveau demandé n'est pas prêt
+    """
+    tiers = bot.readiness()
+    required = request.args.get('require')
+    is_ready = tiers.get(required, False) if required else True
+    return jsonify({
+        'success': True,
+        'ready': is_ready,
+        'tiers': tiers
+    }), 200 if is_ready else 503
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Obtenir l'historique de conversation"""
+    """Obtenir l'historique de conversation de la session (paginé)
+
+    ?offset=0&limit=50, ordre chronologique
+    """
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'offset et limit doivent être des entiers'
+        }), 400
+    
+    history, total = bot.history.get(get_session_id(), offset=offset, limit=limit)
     return jsonify({
         'success': True,
-        'history': bot.conversation_history
+        'history': history,
+        'total': total,
+        'offset': offset,
+        'limit': limit
     })
 
 @app.route('/api/reset', methods=['POST'])
 def reset_conversation():
-    """Réinitialiser la conversation"""
-    bot.conversation_history = []
+    """Réinitialiser la conversation de la session appelante"""
+    bot.reset_history(get_session_id())
     return jsonify({
         'success': True,
         'message': 'Conversation réinitialisée'
@@ -71,17 +177,45 @@ def reset_conversation():
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Statistiques sur les méthodes utilisées"""
-    methods_count = {}
-    for conv in bot.conversation_history:
-        method = conv.get('method', 'unknown')
-        methods_count[method] = methods_count.get(method, 0) + 1
-    
-    return jsonify({
+    """Statistiques sur les méthodes utilisées (agrégées au fil de l'eau)"""
+    metrics = bot.metrics.snapshot()
+    stats = {
         'success': True,
-        'total_messages': len(bot.conversation_history),
-        'methods_distribution': methods_count
-    })
+        'total_messages': metrics['total_messages'],
+        'methods_distribution': {tier: t['count'] for tier, t in metrics['tiers'].items()},
+        'tiers': metrics['tiers'],
+        'categories': metrics['categories'],
+        'latency': metrics['latency'],
+        'sessions': bot.history.stats(),
+        'knowledge_base': bot.knowledge_base_stats()
+    }
+    stats['cascade'] = bot.cascade.stats()
+    stats['cache'] = bot.cache_stats()
+    if hasattr(bot.query_encoder, 'stats'):
+        stats['encoder'] = bot.query_encoder.stats()
+    if inference_service is not None:
+        stats['serving'] = inference_service.stats()
+    return jsonify(stats)
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_knowledge_base():
+    """Recharger la base de connaissances (en-tête X-Admin-Token requis)
+
+    Les index sont reconstruits pendant que /api/chat continue de répondre
+    avec l'ancienne version, puis remplacés d'un bloc.
+    """
+    if not is_admin():
+        return jsonify({
+            'success': False,
+            'error': 'Accès refusé'
+        }), 403
+    report = bot.reload_knowledge_base()
+    return jsonify(report), 200 if report['success'] else 500
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(bot.metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     print("\n" +
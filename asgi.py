@@ -0,0 +1,40 @@
+"""
+Point d'entrée ASGI (production)
+/api/chat est servi en asynchrone via InferenceService; les autres routes
+sont déléguées à l'application Flask.
+
+Lancement: uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+
+from serving import InferenceService, create_asgi_app
+
+
+def _build_default_application():
+    import app as flask_app
+
+    service = InferenceService(
+        flask_app.bot,
+        max_workers=int(os.environ.get('TUNISBOT_MAX_WORKERS', 16)),
+        max_concurrency=int(os.environ.get('TUNISBOT_MAX_CONCURRENCY', 8)),
+        queue_timeout=float(os.environ.get('TUNISBOT_QUEUE_TIMEOUT', 2.0)),
+        request_timeout=float(os.environ.get('TUNISBOT_REQUEST_TIMEOUT', 1.0)),
+        fallback_timeout=float(os.environ.get('TUNISBOT_FALLBACK_TIMEOUT', 0.5))
+    )
+    flask_app.inference_service = service
+    return create_asgi_app(
+        service,
+        fallback_app=WsgiToAsgi(flask_app.app),
+        session_cookie=flask_app.SESSION_COOKIE,
+        session_header=flask_app.SESSION_HEADER,
+        session_id_re=flask_app.SESSION_ID_RE,
+        admin_token=flask_app.ADMIN_TOKEN,
+        admin_header=flask_app.ADMIN_HEADER,
+        profile_header=flask_app.PROFILE_HEADER
+    )
+
+
+application = _build_default_application()
@@ -0,0 +1,144 @@
+"""
+Micro-batching devant SentenceTransformer.encode
+Regroupe les requêtes concurrentes en un seul appel batché
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EncoderOverloaded(RuntimeError):
+    """File d'attente pleine: le service d'encodage refuse la requête"""
+
+
+class EncoderClosed(EncoderOverloaded):
+    """Encodeur arrêté: les phrases en attente ne seront pas encodées"""
+
+
+class MicroBatchEncoder:
+    """Encodeur à micro-batchs
+
+    Les appels à `encode` déposent leurs phrases dans une file. Un thread
+    dédié attend au plus `max_wait_ms` ou `max_batch_size` phrases, encode le
+    tout en un seul appel puis redistribue à chaque appelant ses vecteurs.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5,
+                 max_queue_size=1024, submit_timeout=0.5):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.rejected = 0
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='micro-batch-encoder', daemon=True)
+        self._worker.start()
+
+    def encode(self, sentences, timeout=None):
+        """Même contrat que SentenceTransformer.encode: une ligne par phrase"""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        futures = []
+        try:
+            for sentence in sentences:
+                futures.append(self.submit(sentence))
+            return np.vstack([future.result(timeout=timeout) for future in futures])
+        except BaseException:
+            # File pleine ou délai dépassé: les phrases encore en file ne
+            # sont plus attendues, le thread d'encodage les ignorera
+            for future in futures:
+                future.cancel()
+            raise
+
+    def submit(self, sentence):
+        """Dépose une phrase dans la file et retourne un Future"""
+        if self._stopped.is_set():
+            raise EncoderClosed("Encodeur arrêté")
+        future = Future()
+        try:
+            # Backpressure: on bloque brièvement puis on refuse
+            self._queue.put((sentence, future), timeout=self.submit_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise EncoderOverloaded("File d'encodage pleine")
+        if self._stopped.is_set():
+            # close() a pu vider la file juste avant ce dépôt
+            self._fail_pending()
+        return future
+
+    def _collect_batch(self):
+        """Attend le premier élément puis remplit le batch jusqu'à l'échéance"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Les phrases annulées (appelant parti) ne sont pas encodées
+            batch = [(sentence, future) for sentence, future in self._collect_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            sentences = [sentence for sentence, _ in batch]
+            try:
+                embeddings = np.asarray(self.encode_fn(sentences))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def stats(self):
+        """Distribution des tailles de batch et compteurs"""
+        with self._stats_lock:
+            sizes = dict(sorted(self.batch_sizes.items()))
+            rejected = self.rejected
+        batches = sum(sizes.values())
+        items = sum(size * count for size, count in sizes.items())
+        return {
+            'batches': batches,
+            'items': items,
+            'mean_batch_size': items / batches if batches else 0.0,
+            'batch_size_distribution': sizes,
+            'queue_depth': self._queue.qsize(),
+            'rejected': rejected,
+        }
+
+    def _fail_pending(self):
+        """Termine en erreur les phrases restées dans la file"""
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if future.set_running_or_notify_cancel():
+                future.set_exception(EncoderClosed("Encodeur arrêté"))
+
+    def close(self, timeout=1.0):
+        """Arrête le thread d'encodage; les appels en attente reçoivent EncoderClosed"""
+        self._stopped.set()
+        self._worker.join(timeout=timeout)
+        self._fail_pending()
@@ -0,0 +1,262 @@
+"""
+Benchmark de bout en bout de TunisChatbot.chat_details sur un corpus de requêtes
+Rapporte le débit, les percentiles de latence totale et par étape tracée
+(règles, prétraitement, TF-IDF, encodage, similarité...), la mémoire de
+pointe, et écrit les résultats en JSON pour comparer deux versions.
+
+Corpus: fichier JSONL ou texte (une requête par ligne, champ détecté comme
+en mode --batch), par défaut les questions de la base et leurs variantes.
+Sans sentence-transformers (ou avec --encoder stub), un encodeur haché hors
+ligne remplace Sentence-BERT: les étapes restent mesurées, pas la qualité.
+
+Usage: python benchmarks/bench_e2e.py [--corpus requests.jsonl] [--iterations 5]
+       [--output results.json] [--baseline previous.json --tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from index_store import IndexStore  # noqa: E402
+from knowledge_base import load_knowledge_base  # noqa: E402
+from load_test import QUERIES  # noqa: E402
+from text_normalizer import TextNormalizer  # noqa: E402
+import tunis_chatbot  # noqa: E402
+
+RESULTS_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+
+class StubEncoder:
+    """Encodeur hors ligne: sac de mots haché, même interface que SentenceTransformer.encode
+
+    encode_ms simule le coût d'un vrai modèle (par phrase, GIL libéré).
+    """
+
+    model_name = 'stub-hashing'
+
+    def __init__(self, dim=384, encode_ms=0.0):
+        self.dim = dim
+        self.encode_ms = encode_ms
+        self.normalizer = TextNormalizer()
+
+    def encode(self, sentences, **kwargs):
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for token in self.normalizer.normalize(sentence).split():
+                vectors[row, zlib.crc32(token.encode('utf-8')) % self.dim] += 1.0
+        if self.encode_ms:
+            time.sleep(self.encode_ms * len(sentences) / 1000)
+        return vectors
+
+
+def load_corpus(path=None, field=None):
+    """Requêtes du fichier, ou questions de la base + QUERIES de load_test.py"""
+    if path is None:
+        return [item['question'] for item in load_knowledge_base()] + QUERIES
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            _, query = tunis_chatbot._parse_query_line(line, field)
+            if query:
+                queries.append(query)
+    if not queries:
+        raise SystemExit(f"❌ Aucune requête trouvée dans {path}")
+    return queries
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    summary = {'count': int(values.size), 'mean_ms': round(float(values.mean()), 4)}
+    for q in PERCENTILES:
+        summary[f'p{q}_ms'] = round(float(np.percentile(values, q)), 4)
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb():
+    # ru_maxrss: Ko sous Linux, octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_queries(bot, queries, threads):
+    """Un chat_details par requête; retourne ([(total ms, résultat)], durée s)"""
+    def one(query):
+        start = time.perf_counter()
+        result = bot.chat_details(query, session_id=f'bench-{threading.get_ident()}')
+        return (time.perf_counter() - start) * 1000, result
+
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            samples = list(executor.map(one, queries))
+    else:
+        samples = [one(query) for query in queries]
+    return samples, time.perf_counter() - start
+
+
+def compare(results, baseline, tolerance):
+    """Régressions au-delà de tolerance (fraction) par rapport à baseline"""
+    if baseline.get('config') != results['config'] or baseline.get('corpus') != results['corpus']:
+        print("⚠️ Corpus ou configuration différents de la référence: comparaison indicative")
+    regressions = []
+    old, new = baseline['throughput_qps'], results['throughput_qps']
+    if new < old * (1 - tolerance):
+        regressions.append(f"débit {old:.1f} -> {new:.1f} req/s")
+    for stat in ('p50_ms', 'p95_ms'):
+        old = baseline['latency_ms']['total'][stat]
+        new = results['latency_ms']['total'][stat]
+        if new > old * (1 + tolerance):
+            regressions.append(f"latence totale {stat} {old:.3f} -> {new:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='fichier de requêtes (JSONL ou texte)')
+    parser.add_argument('--field', help='champ contenant la requête (détecté sinon)')
+    parser.add_argument('--iterations', type=int, default=5, help='passes mesurées sur le corpus')
+    parser.add_argument('--warmup-passes', type=int, default=1, help='passes non mesurées')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--encoder', choices=('auto', 'stub', 'real'), default='auto')
+    parser.add_argument('--encode-ms', type=float, default=0.0,
+                        help="coût simulé de l'encodeur bouchon (ms par phrase)")
+    parser.add_argument('--cascade', choices=('legacy', 'cost'), default='legacy',
+                        help="preset de la cascade ('legacy': les embeddings sont toujours évalués, "
+                             "'cost': sortie anticipée au niveau TF-IDF)")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help="caches de réponses et d'embeddings des requêtes (0 = désactivés)")
+    parser.add_argument('--batch-encoding', action='store_true', help='micro-batching des encodages')
+    parser.add_argument('--index-backend', choices=('exact', 'ivf'), default='exact')
+    parser.add_argument('--embedding-precision', choices=('float32', 'float16', 'int8'), default='float32')
+    parser.add_argument('--index-dir', help='répertoire des index (temporaire par défaut)')
+    parser.add_argument('--output', help='fichier JSON des résultats')
+    parser.add_argument('--baseline', help='résultats JSON précédents à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='dégradation tolérée par rapport à --baseline (code de sortie 1 au-delà)')
+    args = parser.parse_args()
+
+    queries = load_corpus(args.corpus, args.field)
+    if args.encoder == 'stub' or (args.encoder == 'auto' and not tunis_chatbot.USE_EMBEDDINGS):
+        encoder = StubEncoder(encode_ms=args.encode_ms)
+    else:
+        encoder = None
+
+    index_dir = tempfile.TemporaryDirectory() if args.index_dir is None else None
+    start = time.perf_counter()
+    bot = tunis_chatbot.TunisChatbot(
+        warmup='eager', encoder=encoder, cascade=args.cascade,
+        cache_size=args.cache_size, embedding_cache_size=args.cache_size,
+        batch_encoding=args.batch_encoding, index_backend=args.index_backend,
+        embedding_precision=args.embedding_precision,
+        index_store=IndexStore(index_dir.name if index_dir else args.index_dir)
+    )
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    for _ in range(args.warmup_passes):
+        run_queries(bot, queries, args.threads)
+
+    samples, elapsed = [], 0.0
+    for _ in range(args.iterations):
+        batch, seconds = run_queries(bot, queries, args.threads)
+        samples += batch
+        elapsed += seconds
+
+    # Étapes tracées et niveaux de la cascade, par requête
+    stages = {'total': [total_ms for total_ms, _ in samples]}
+    tiers = {}
+    for _, result in samples:
+        for name, elapsed_ms in result.metadata.get('spans_ms', {}).items():
+            stages.setdefault(name, []).append(elapsed_ms)
+        for name, elapsed_ms in result.metadata.get('timings_ms', {}).items():
+            stages.setdefault(f'tier:{name}', []).append(elapsed_ms)
+        tiers[result.tier] = tiers.get(result.tier, 0) + 1
+
+    # Mémoire Python allouée pendant une passe (tracemalloc ralentit: passe à part)
+    tracemalloc.start()
+    run_queries(bot, queries, args.threads)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.time(),
+        'environment': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'encoder': bot.model_name,
+        },
+        'config': {name: value for name, value in vars(args).items()
+                   if name not in ('output', 'baseline', 'tolerance')},
+        'corpus': {'path': args.corpus, 'queries': len(queries)},
+        'requests': len(samples),
+        'startup_ms': round(startup_ms, 1),
+        'throughput_qps': round(len(samples) / elapsed, 2),
+        'latency_ms': {name: summarize(values) for name, values in sorted(stages.items())},
+        'tiers': tiers,
+        'memory': {
+            'peak_rss_mb': peak_rss_mb(),
+            'query_heap_peak_mb': round(heap_peak / (1024 * 1024), 3),
+            'embeddings': bot.knowledge_base_stats()['embeddings'],
+        },
+    }
+    if index_dir is not None:
+        index_dir.cleanup()
+
+    print(f"Encodeur: {bot.model_name} | {len(queries)} requêtes x {args.iterations} passes, "
+          f"{args.threads} thread(s)")
+    print(f"Démarrage: {startup_ms:.0f} ms | débit: {results['throughput_qps']:.1f} req/s")
+    print(f"{'étape':<24} {'n':>7} {'moy ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in results['latency_ms'].items():
+        print(f"{name:<24} {summary['count']:>7} {summary['mean_ms']:>9.3f} {summary['p50_ms']:>9.3f} "
+              f"{summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
+    print(f"Niveaux retenus: {tiers}")
+    print(f"Mémoire: RSS max {results['memory']['peak_rss_mb']} Mo, "
+          f"pic Python pendant une passe {results['memory']['query_heap_peak_mb']} Mo")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📄 Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            for regression in regressions:
+                print(f"❌ Régression: {regression}")
+            sys.exit(1)
+        print(f"✅ Pas de régression (tolérance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Microbenchmark de la normalisation du texte: TextNormalizer vs ancien
+prétraitement NLTK (word_tokenize + liste de mots vides), en tokens/s.
+La non-régression de la recherche TF-IDF est vérifiée par
+tests/test_text_normalizer.py.
+
+Usage: python benchmarks/bench_normalizer.py [--repeat 200]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from knowledge_base import load_knowledge_base  # noqa: E402
+from text_normalizer import FRENCH_STOP_WORDS, TextNormalizer  # noqa: E402
+
+
+def legacy_preprocessor():
+    """Ancien preprocess_text; sans les données NLTK, word_tokenize est
+    approché par split() (la ponctuation est déjà remplacée par des espaces)"""
+    try:
+        from nltk.corpus import stopwords
+        from nltk.tokenize import word_tokenize
+        stop_words = set(stopwords.words('french'))
+        word_tokenize('test', language='french')
+        label = 'nltk'
+    except (ImportError, LookupError):
+        stop_words = set(FRENCH_STOP_WORDS)
+        word_tokenize = lambda text, language=None: text.split()  # noqa: E731
+        label = 'split (données NLTK absentes)'
+
+    def preprocess(text):
+        text = text.lower()
+        text = re.sub(r'[^\w\s]', ' ', text)
+        tokens = word_tokenize(text, language='french')
+        return ' '.join(t for t in tokens if t not in stop_words and len(t) > 2)
+    return preprocess, label
+
+
+def tokens_per_second(preprocess, texts, repeat):
+    n_tokens = sum(len(text.split()) for text in texts) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            preprocess(text)
+    return n_tokens / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    texts = [item['question'] for item in load_knowledge_base()]
+    legacy, label = legacy_preprocessor()
+
+    # Sans mémoïsation pour mesurer le coût réel, puis avec (requêtes répétées)
+    normalizer = TextNormalizer()
+    legacy_tps = tokens_per_second(legacy, texts, args.repeat)
+    raw_tps = tokens_per_second(normalizer._normalize, texts, args.repeat)
+    cached_tps = tokens_per_second(normalizer.normalize, texts, args.repeat)
+    print(f"Ancien prétraitement ({label}): {legacy_tps:>12,.0f} tokens/s")
+    print(f"TextNormalizer                : {raw_tps:>12,.0f} tokens/s ({raw_tps / legacy_tps:.1f}x)")
+    print(f"TextNormalizer mémoïsé        : {cached_tps:>12,.0f} tokens/s ({cached_tps / legacy_tps:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
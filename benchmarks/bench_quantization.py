@@ -0,0 +1,77 @@
+"""
+Benchmark du stockage compact des embeddings (float16, int8 + échelles)
+Rapporte les octets par entrée, la latence et le taux d'accord top-1 avec
+float32, avec et sans rescoring float32 des meilleurs candidats.
+
+Par défaut: données synthétiques (voir bench_vector_index.py). --embeddings
+évalue une matrice réelle, par exemple index_cache/<hash>/question_embeddings.npy,
+avec des requêtes qui en sont des copies bruitées.
+
+Usage: python benchmarks/bench_quantization.py [--sizes 10000 100000] [--rerank 0 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vector_index import synthetic_corpus  # noqa: E402
+from vector_index import ExactIndex, normalize_rows  # noqa: E402
+
+
+def corpora(args, rng):
+    if args.embeddings:
+        vectors = normalize_rows(np.load(args.embeddings))
+        targets = rng.integers(0, vectors.shape[0], args.queries)
+        noise = args.noise * rng.standard_normal((args.queries, vectors.shape[1])).astype(np.float32)
+        yield vectors, vectors[targets] + noise / np.sqrt(vectors.shape[1])
+        return
+    for n in args.sizes:
+        yield synthetic_corpus(n, args.dim, args.queries, rng)
+
+
+def top1(index, queries):
+    start = time.perf_counter()
+    indices, _ = index.best_batch(queries)
+    batch_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for query in queries:
+        index.best(query)
+    single_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return indices, single_ms, batch_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--rerank', type=int, nargs='+', default=[0, 10])
+    parser.add_argument('--embeddings', help="fichier .npy d'embeddings à évaluer")
+    parser.add_argument('--noise', type=float, default=0.5,
+                        help='bruit des requêtes pour --embeddings (relatif à la norme)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'stockage':<12} {'octets/entrée':>14} {'ms/req':>8} {'lot ms':>8} {'accord top-1':>13}")
+    for vectors, queries in corpora(args, rng):
+        n = vectors.shape[0]
+        reference = ExactIndex(vectors, normalized=True)
+        expected, single_ms, batch_ms = top1(reference, queries)
+        print(f"{n:>8} {'float32':<12} {reference.memory()['bytes_per_entry']:>14.0f} "
+              f"{single_ms:>8.3f} {batch_ms:>8.1f} {1.0:>13.3f}")
+        for precision in ('float16', 'int8'):
+            for rerank in args.rerank:
+                index = ExactIndex(vectors, normalized=True, precision=precision, rerank=rerank)
+                indices, single_ms, batch_ms = top1(index, queries)
+                label = precision if not rerank else f'{precision}+r{rerank}'
+                print(f"{n:>8} {label:<12} {index.memory()['bytes_per_entry']:>14.0f} "
+                      f"{single_ms:>8.3f} {batch_ms:>8.1f} {np.mean(indices == expected):>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Microbenchmark du moteur de règles: regex combinée vs ancienne boucle
+(re.search sur chaque motif non compilé) pour 10, 100 et 1000 intentions.
+Vérifie aussi que les deux approches choisissent la même intention.
+
+Usage: python benchmarks/bench_rules.py [--intents 10 100 1000] [--queries 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rule_engine import DEFAULT_RULES_PATH, RuleEngine  # noqa: E402
+
+WORDS = ["horaires", "tarif", "billet", "urgence", "pharmacie", "musée", "plage", "taxi",
+         "hôtel", "restaurant", "souk", "médina", "carthage", "bardo", "train", "météo"]
+
+
+def synthetic_table(n_intents, rng):
+    with open(DEFAULT_RULES_PATH, encoding='utf-8') as f:
+        table = json.load(f)
+    while len(table) < n_intents:
+        i = len(table)
+        keywords = [f"{rng.choice(WORDS)}{i}", f"{rng.choice(WORDS)}_{i}"]
+        table.append({
+            'intent': f'intent_{i}',
+            'patterns': [rf"\b({'|'.join(keywords)})\b"],
+            'reply': f'Réponse {i}',
+        })
+    return table[:n_intents]
+
+
+def synthetic_queries(table, n_queries, rng):
+    queries = []
+    for _ in range(n_queries):
+        words = rng.sample(WORDS, 6)
+        if rng.random() < 0.5:
+            row = rng.choice(table)
+            keyword = re.search(r'\(([^|)]+)', row['patterns'][0]).group(1)
+            words.insert(rng.randrange(len(words)), keyword.replace('\\', ''))
+        queries.append(' '.join(words))
+    return queries
+
+
+def legacy_match(patterns, text):
+    """Ancienne implémentation: dict d'intentions, re.search motif par motif"""
+    for name, intent_patterns in patterns.items():
+        for pattern in intent_patterns:
+            if re.search(pattern, text):
+                return name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--intents', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'intents':>8} {'boucle µs/req':>14} {'compilé µs/req':>15} {'gain':>6} {'identiques':>11}")
+    for n_intents in args.intents:
+        table = synthetic_table(n_intents, rng)
+        queries = [q.lower() for q in synthetic_queries(table, args.queries, rng)]
+        patterns = {row['intent']: row['patterns'] for row in table}
+        engine = RuleEngine.from_table(table)
+
+        start = time.perf_counter()
+        legacy = [legacy_match(patterns, q) for q in queries]
+        legacy_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        start = time.perf_counter()
+        compiled = [getattr(engine.match(q), 'intent', None) for q in queries]
+        compiled_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        same = sum(a == b for a, b in zip(legacy, compiled)) / len(queries)
+        print(f"{n_intents:>8} {legacy_us:>14.1f} {compiled_us:>15.1f} "
+              f"{legacy_us / compiled_us:>5.1f}x {same:>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
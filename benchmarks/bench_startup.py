@@ -0,0 +1,59 @@
+"""
+Benchmark de démarrage: temps d'import et temps jusqu'à la première réponse
+Chaque mesure tourne dans un processus neuf (imports à froid).
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--warmup background|eager|lazy]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import tunis_chatbot
+t_import = time.perf_counter() - t0
+bot = tunis_chatbot.TunisChatbot(warmup=sys.argv[1])
+t_init = time.perf_counter() - t0
+_, method = bot.get_response("Où manger à Tunis?")
+t_first = time.perf_counter() - t0
+t_embeddings = None
+if tunis_chatbot.USE_EMBEDDINGS and sys.argv[1] != 'lazy':
+    bot._embeddings_ready.wait(timeout=600)
+    t_embeddings = time.perf_counter() - t0
+print(json.dumps({"import": t_import, "init": t_init, "first_answer": t_first,
+                  "first_method": method, "embeddings_ready": t_embeddings}))
+'''
+
+
+def run_once(warmup):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD, warmup],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', default='background', choices=['background', 'eager', 'lazy'])
+    args = parser.parse_args()
+
+    results = [run_once(args.warmup) for _ in range(args.runs)]
+    print(f"Démarrage ({args.warmup}, {args.runs} exécutions, médiane):")
+    for key in ('import', 'init', 'first_answer', 'embeddings_ready'):
+        values = [r[key] for r in results if r[key] is not None]
+        if values:
+            print(f"  {key:<18} {statistics.median(values) * 1000:9.1f} ms")
+    print(f"  première méthode   {results[-1]['first_method']}")
+
+
+if __name__ == '__main__':
+    main()
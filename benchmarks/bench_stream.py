@@ -0,0 +1,100 @@
+"""
+Temps avant le premier octet (TTFB): /api/chat vs /api/chat/stream
+Même client ASGI local que load_test.py; TTFB = premier fragment du corps
+reçu, total = fin de la réponse. Le flux envoie la réponse règles/TF-IDF
+sans attendre les embeddings.
+
+Usage: python benchmarks/bench_stream.py [--requests 200] [--concurrency 8] [--real]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import QUERIES, StubBot, percentile  # noqa: E402
+from serving import InferenceService, create_asgi_app  # noqa: E402
+
+
+async def call(application, path, message):
+    """Une requête POST; retourne (statut, ttfb ms, total ms, événements SSE)"""
+    body = json.dumps({'message': message}).encode('utf-8')
+    scope = {'type': 'http', 'method': 'POST', 'path': path,
+             'headers': [(b'content-type', b'application/json'), (b'x-session-id', b'bench')]}
+    sent = False
+    status = None
+    ttfb = None
+    chunks = []
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        nonlocal status, ttfb
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message.get('body'):
+            if ttfb is None:
+                ttfb = (time.perf_counter() - start) * 1000
+            chunks.append(message['body'])
+
+    await application(scope, receive, send)
+    total = (time.perf_counter() - start) * 1000
+    events = [line[7:] for line in b''.join(chunks).decode('utf-8').splitlines()
+              if line.startswith('event: ')]
+    return status, ttfb, total, events
+
+
+async def run(application, path, n_requests, concurrency):
+    results = []
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            results.append(await call(application, path, QUERIES[i % len(QUERIES)]))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--request-timeout', type=float, default=1.0)
+    parser.add_argument('--real', action='store_true', help='utiliser le vrai TunisChatbot')
+    args = parser.parse_args()
+
+    if args.real:
+        from tunis_chatbot import TunisChatbot
+        bot = TunisChatbot(warmup='eager', cache_size=0)
+    else:
+        bot = StubBot(slow_ratio=0.0)
+
+    service = InferenceService(bot, max_workers=args.concurrency * 2,
+                               max_concurrency=args.concurrency,
+                               request_timeout=args.request_timeout)
+    application = create_asgi_app(service)
+    print(f"{'endpoint':<18} {'ttfb p50':>9} {'ttfb p95':>9} {'total p50':>10} {'upgrades':>9}")
+    for path in ('/api/chat', '/api/chat/stream'):
+        results = asyncio.run(run(application, path, args.requests, args.concurrency))
+        ok = [r for r in results if r[0] == 200]
+        ttfb = [r[1] for r in ok]
+        total = [r[2] for r in ok]
+        upgrades = sum('upgrade' in r[3] for r in ok)
+        print(f"{path:<18} {percentile(ttfb, 50):>9.1f} {percentile(ttfb, 95):>9.1f} "
+              f"{percentile(total, 50):>10.1f} {upgrades:>9}")
+    service.executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    main()
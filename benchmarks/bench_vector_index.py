@@ -0,0 +1,76 @@
+"""
+Benchmark rappel / latence des index vectoriels sur données synthétiques
+Les vecteurs sont regroupés en clusters (comme des questions par thème)
+et les requêtes sont des copies bruitées d'entrées de la base.
+
+Usage: python benchmarks/bench_vector_index.py [--sizes 1000 10000 100000] [--dim 384]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import ExactIndex, IVFIndex, normalize_rows  # noqa: E402
+
+
+def synthetic_corpus(n, dim, n_queries, rng):
+    n_clusters = max(8, n // 200)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    targets = rng.integers(0, n, n_queries)
+    queries = vectors[targets] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return normalize_rows(vectors), queries
+
+
+def measure(index, queries, k, **search_kwargs):
+    start = time.perf_counter()
+    results = [[idx for idx, _ in index.search(q, k=k, **search_kwargs)] for q in queries]
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000
+
+
+def recall(approx, exact):
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'index':<12} {'build s':>8} {'ms/req':>8} {'recall@1':>9} {'recall@k':>9}")
+    for n in args.sizes:
+        vectors, queries = synthetic_corpus(n, args.dim, args.queries, rng)
+
+        start = time.perf_counter()
+        exact = ExactIndex(vectors, normalized=True)
+        build = time.perf_counter() - start
+        exact_results, latency = measure(exact, queries, args.k)
+        exact_top1 = [r[:1] for r in exact_results]
+        print(f"{n:>8} {'exact':<12} {build:>8.2f} {latency:>8.3f} {1.0:>9.3f} {1.0:>9.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(vectors, normalized=True)
+        build = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            results, latency = measure(ivf, queries, args.k, nprobe=nprobe)
+            r1 = recall([r[:1] for r in results], exact_top1)
+            rk = recall(results, exact_results)
+            label = f'ivf/{nprobe}'
+            print(f"{n:>8} {label:<12} {build:>8.2f} {latency:>8.3f} {r1:>9.3f} {rk:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
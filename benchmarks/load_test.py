@@ -0,0 +1,137 @@
+"""
+Test de charge du point d'entrée ASGI, sans réseau
+Un client local appelle directement l'application ASGI; par défaut le
+chatbot est un bouchon aux latences réalistes (TF-IDF rapide, embeddings
+plus lents et parfois très lents) pour isoler le comportement du serveur.
+
+Usage: python benchmarks/load_test.py [--concurrency 1 4 16 64] [--requests 400] [--real]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cascade import CascadeResult  # noqa: E402
+from serving import InferenceService, create_asgi_app  # noqa: E402
+
+QUERIES = [
+    "Où manger à Tunis?",
+    "Comment aller de l'aéroport au centre-ville?",
+    "Que voir dans la Médina?",
+    "bonjour",
+    "Quelle est la meilleure période pour visiter?",
+    "Que ramener comme souvenir?",
+]
+
+
+class StubBot:
+    """Chatbot factice: time.sleep libère le GIL comme une vraie inférence"""
+
+    def __init__(self, tfidf_ms=1.0, embedding_ms=15.0, slow_ratio=0.02, slow_ms=2000.0, seed=0):
+        self.tfidf_ms = tfidf_ms
+        self.embedding_ms = embedding_ms
+        self.slow_ratio = slow_ratio
+        self.slow_ms = slow_ms
+        self.rng = random.Random(seed)
+
+    def first_response(self, message):
+        time.sleep(self.tfidf_ms / 1000)
+        return CascadeResult('réponse tfidf', 'tfidf (score: 0.42)', 'tfidf', 0.42, {}), False
+
+    def get_response_details(self, message, skip=()):
+        time.sleep(self.tfidf_ms / 1000)
+        if 'embedding' in skip:
+            return CascadeResult('réponse tfidf', 'tfidf (score: 0.42)', 'tfidf', 0.42, {})
+        slow = self.rng.random() < self.slow_ratio
+        time.sleep((self.slow_ms if slow else self.embedding_ms) / 1000)
+        return CascadeResult('réponse embedding', 'embedding (score: 0.80)', 'embedding', 0.8, {})
+
+    get_response_traced = get_response_details
+
+    def record_exchange(self, user_input, result, elapsed_ms, session_id=None, ttfb_ms=None):
+        pass
+
+
+async def call(application, message):
+    """Client ASGI minimal: une requête POST /api/chat"""
+    body = json.dumps({'message': message}).encode('utf-8')
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat',
+             'headers': [(b'content-type', b'application/json'), (b'x-session-id', b'loadtest')]}
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return status, (time.perf_counter() - start) * 1000
+
+
+async def run_level(application, concurrency, n_requests):
+    latencies, statuses = [], []
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            status, latency = await call(application, QUERIES[i % len(QUERIES)])
+            statuses.append(status)
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--request-timeout', type=float, default=0.25)
+    parser.add_argument('--real', action='store_true', help='utiliser le vrai TunisChatbot')
+    args = parser.parse_args()
+
+    if args.real:
+        from tunis_chatbot import TunisChatbot
+        bot = TunisChatbot(warmup='eager', cache_size=0)
+    else:
+        bot = StubBot()
+
+    print(f"{'conc.':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'timeouts':>9} {'503':>5}")
+    for concurrency in args.concurrency:
+        service = InferenceService(bot, max_workers=args.max_concurrency * 2,
+                                   max_concurrency=args.max_concurrency,
+                                   request_timeout=args.request_timeout)
+        application = create_asgi_app(service)
+        latencies, statuses, elapsed = asyncio.run(run_level(application, concurrency, args.requests))
+        ok = [lat for lat, status in zip(latencies, statuses) if status == 200]
+        print(f"{concurrency:>6} {len(ok) / elapsed:>8.1f} {percentile(ok, 50):>8.1f} "
+              f"{percentile(ok, 95):>8.1f} {percentile(ok, 99):>8.1f} "
+              f"{service.timeouts:>9} {statuses.count(503):>5}")
+        service.executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    main()
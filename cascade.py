@@ -0,0 +1,190 @@
+"""
+Cascade de recherche ordonnée par coût
+Règles -> TF-IDF -> Embeddings, avec sortie anticipée par niveau
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Tier:
+    """Un niveau de la cascade
+
+    scorer(user_input, threshold) -> (answer ou None, score, ...)
+    accept: score minimal pour que la réponse soit valable
+    exit: score à partir duquel on arrête la cascade (None = jamais)
+    """
+
+    def __init__(self, name, scorer, accept, exit=None):
+        self.name = name
+        self.scorer = scorer
+        self.accept = accept
+        self.exit = exit
+
+
+class CascadeResult:
+    """Réponse retenue et métadonnées d'exécution"""
+
+    def __init__(self, response, method, tier, score, metadata):
+        self.response = response
+        self.method = method
+        self.tier = tier
+        self.score = score
+        self.metadata = metadata
+
+    def as_tuple(self):
+        return self.response, self.method
+
+
+# Seuils par preset: (niveau, accept, exit)
+# 'legacy' reproduit l'ancien get_response: embeddings > 0.5 puis TF-IDF > 0.3,
+# les deux niveaux étant toujours évalués.
+# 'cost' s'arrête dès que TF-IDF est très confiant.
+PRESETS = {
+    'legacy': [
+        ('rule-based', 0.0, 0.0),
+        ('tfidf', 0.3, None),
+        ('embedding', 0.5, None),
+    ],
+    'cost': [
+        ('rule-based', 0.0, 0.0),
+        ('tfidf', 0.3, 0.6),
+        ('embedding', 0.5, None),
+    ],
+}
+
+
+class Cascade:
+    """Évalue les niveaux dans l'ordre et retient la meilleure réponse
+
+    Sans sortie anticipée, la réponse valable du niveau le plus coûteux
+    (donc le plus précis) l'emporte. En mode parallèle, tous les niveaux
+    sont lancés en même temps et la sélection suit le même ordre.
+    """
+
+    def __init__(self, tiers, fallback, name='custom', parallel=False, max_workers=4):
+        self.tiers = tiers
+        self.fallback = fallback
+        self.name = name
+        self.parallel = parallel
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if parallel else None
+        self._lock = threading.Lock()
+        self.counters = {
+            tier.name: {'evaluated': 0, 'selected': 0, 'early_exits': 0, 'total_ms': 0.0}
+            for tier in tiers
+        }
+        self.counters['fallback'] = {'selected': 0}
+        self.total = 0
+
+    @classmethod
+    def from_preset(cls, preset, scorers, fallback, parallel=False):
+        """scorers: dict nom du niveau -> fonction de score"""
+        tiers = [Tier(name, scorers[name], accept, exit)
+                 for name, accept, exit in PRESETS[preset]]
+        return cls(tiers, fallback, name=preset, parallel=parallel)
+
+    def _evaluate(self, tier, user_input):
+        start = time.perf_counter()
+        answer, score = tier.scorer(user_input, tier.accept)[:2]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return answer, float(score), elapsed_ms
+
+    def run(self, user_input, skip=(), record=True):
+        """record=False: réponse provisoire (streaming), hors statistiques"""
+        tiers = [tier for tier in self.tiers if tier.name not in skip]
+        if self.parallel:
+            # Chaque niveau garde le contexte de l'appelant (trace de la requête)
+            futures = [self._executor.submit(contextvars.copy_context().run, self._evaluate, tier, user_input)
+                       for tier in tiers]
+            outcomes = (future.result() for future in futures)
+        else:
+            outcomes = (self._evaluate(tier, user_input) for tier in tiers)
+
+        timings = {}
+        selected = None
+        early_exit = None
+        for tier, (answer, score, elapsed_ms) in zip(tiers, outcomes):
+            timings[tier.name] = round(elapsed_ms, 3)
+            if answer is not None and score > tier.accept:
+                selected = (tier, answer, score)
+                if tier.exit is not None and score > tier.exit:
+                    early_exit = tier.name
+                    break
+        if self.parallel and early_exit is not None:
+            for future in futures[len(timings):]:
+                future.cancel()
+
+        metadata = {
+            'cascade': self.name,
+            'timings_ms': timings,
+            'evaluated': list(timings),
+            'early_exit': early_exit,
+        }
+        if selected is None:
+            result = CascadeResult(self.fallback(user_input), 'fallback', 'fallback', 0.0, metadata)
+        else:
+            tier, answer, score = selected
+            method = tier.name if tier.name == 'rule-based' else f'{tier.name} (score: {score:.2f})'
+            result = CascadeResult(answer, method, tier.name, score, metadata)
+        if record:
+            self._record(result, timings, early_exit)
+        return result
+
+    def run_batch(self, queries, batch_scorers):
+        """Même sélection que run() sur un lot de requêtes
+
+        batch_scorers: nom du niveau -> fonction(requêtes, seuil) qui retourne
+        une liste de (answer ou None, score). Chaque niveau n'est évalué que
+        sur les requêtes encore ouvertes (pas de sortie anticipée avant lui).
+        Les compteurs de la cascade ne sont pas mis à jour.
+        """
+        selected = [None] * len(queries)
+        open_rows = list(range(len(queries)))
+        for tier in self.tiers:
+            if not open_rows:
+                break
+            outcomes = batch_scorers[tier.name]([queries[row] for row in open_rows], tier.accept)
+            still_open = []
+            for row, (answer, score) in zip(open_rows, outcomes):
+                score = float(score)
+                if answer is not None and score > tier.accept:
+                    selected[row] = (tier, answer, score)
+                    if tier.exit is not None and score > tier.exit:
+                        continue
+                still_open.append(row)
+            open_rows = still_open
+
+        results = []
+        for query, choice in zip(queries, selected):
+            if choice is None:
+                results.append(CascadeResult(self.fallback(query), 'fallback', 'fallback', 0.0,
+                                             {'cascade': self.name, 'batch': True}))
+                continue
+            tier, answer, score = choice
+            method = tier.name if tier.name == 'rule-based' else f'{tier.name} (score: {score:.2f})'
+            results.append(CascadeResult(answer, method, tier.name, score,
+                                         {'cascade': self.name, 'batch': True}))
+        return results
+
+    def _record(self, result, timings, early_exit):
+        with self._lock:
+            self.total += 1
+            for name, elapsed_ms in timings.items():
+                self.counters[name]['evaluated'] += 1
+                self.counters[name]['total_ms'] += elapsed_ms
+            self.counters[result.tier]['selected'] += 1
+            if early_exit is not None:
+                self.counters[early_exit]['early_exits'] += 1
+
+    def stats(self):
+        """Taux d'évaluation/de sélection et temps moyen par niveau"""
+        with self._lock:
+            total = self.total
+            counters = {name: dict(values) for name, values in self.counters.items()}
+        for values in counters.values():
+            values['hit_rate'] = values['selected'] / total if total else 0.0
+            if 'evaluated' in values:
+                values['mean_ms'] = values['total_ms'] / values['evaluated'] if values['evaluated'] else 0.0
+        return {'cascade': self.name, 'parallel': self.parallel, 'total': total, 'tiers': counters}
@@ -0,0 +1,171 @@
+"""
+Historique de conversation par session
+Tampons circulaires bornés, éviction des sessions inactives, budget mémoire
+et débordement optionnel vers SQLite pour les sessions longues
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_SESSION = 'default'
+
+
+def _entry_size(entry):
+    # Estimation grossière: texte UTF-8 + surcoût des objets Python
+    return 200 + sum(len(str(value).encode('utf-8')) for value in entry.values())
+
+
+class _Session:
+    def __init__(self, max_messages, spilled=0):
+        self.messages = deque(maxlen=max_messages)
+        self.bytes = 0
+        self.spilled = spilled
+        self.last_seen = time.monotonic()
+
+
+class SessionHistoryStore:
+    """Historique borné par session
+
+    max_messages: taille du tampon circulaire d'une session
+    idle_ttl: secondes d'inactivité avant éviction d'une session
+    memory_budget: octets (estimés) pour l'ensemble des sessions en mémoire
+    spill_path: base SQLite où déborder les messages anciens et les sessions
+        évincées (None = les messages sortis du tampon sont perdus)
+    """
+
+    def __init__(self, max_messages=100, idle_ttl=1800, memory_budget=64 * 1024 * 1024,
+                 spill_path=None):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.evicted_sessions = 0
+        self._db = None
+        if spill_path is not None:
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "session_id TEXT, seq INTEGER, user TEXT, bot TEXT, method TEXT, timestamp REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS history_session ON history (session_id, seq)")
+            self._db.commit()
+
+    # --- débordement SQLite -------------------------------------------------
+
+    def _spilled_count(self, session_id):
+        if self._db is None:
+            return 0
+        row = self._db.execute(
+            "SELECT COUNT(*) FROM history WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0]
+
+    def _spill(self, session_id, entries, first_seq):
+        if self._db is None or not entries:
+            return
+        self._db.executemany(
+            "INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)",
+            [(session_id, first_seq + i, e['user'], e['bot'], e['method'], e.get('timestamp'))
+             for i, e in enumerate(entries)]
+        )
+        self._db.commit()
+
+    def _read_spilled(self, session_id, offset, limit):
+        rows = self._db.execute(
+            "SELECT user, bot, method, timestamp FROM history WHERE session_id = ? "
+            "ORDER BY seq LIMIT ? OFFSET ?", (session_id, limit, offset)
+        ).fetchall()
+        return [{'user': u, 'bot': b, 'method': m, 'timestamp': t} for u, b, m, t in rows]
+
+    # --- gestion des sessions ----------------------------------------------
+
+    def _evict(self, session_id):
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.bytes
+        self.evicted_sessions += 1
+        self._spill(session_id, list(session.messages), session.spilled)
+
+    def _evict_expired(self, now):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.idle_ttl:
+                break
+            self._evict(session_id)
+
+    def _enforce_budget(self, keep):
+        while self.total_bytes > self.memory_budget and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                self._sessions.move_to_end(keep)
+                continue
+            self._evict(oldest)
+
+    def _session(self, session_id, create):
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = _Session(self.max_messages, spilled=self._spilled_count(session_id))
+            self._sessions[session_id] = session
+        session.last_seen = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    # --- API publique --------------------------------------------------------
+
+    def append(self, session_id, entry):
+        entry = dict(entry, timestamp=entry.get('timestamp', time.time()))
+        size = _entry_size(entry)
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            session = self._session(session_id, create=True)
+            if len(session.messages) == session.messages.maxlen:
+                oldest = session.messages[0]
+                session.bytes -= _entry_size(oldest)
+                self.total_bytes -= _entry_size(oldest)
+                if self._db is not None:
+                    self._spill(session_id, [oldest], session.spilled)
+                    session.spilled += 1
+            session.messages.append(entry)
+            session.bytes += size
+            self.total_bytes += size
+            self._enforce_budget(keep=session_id)
+
+    def get(self, session_id, offset=0, limit=None):
+        """Messages de la session dans l'ordre chronologique, et leur nombre total"""
+        with self._lock:
+            session = self._session(session_id, create=False)
+            memory = list(session.messages) if session is not None else []
+            spilled = session.spilled if session is not None else self._spilled_count(session_id)
+            total = spilled + len(memory)
+            end = total if limit is None else min(total, offset + limit)
+            entries = []
+            if offset < spilled and self._db is not None:
+                entries = self._read_spilled(session_id, offset, min(end, spilled) - offset)
+            start = max(offset - spilled, 0)
+            entries += memory[start:max(end - spilled, 0)]
+        return entries, total
+
+    def reset(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.total_bytes -= session.bytes
+            if self._db is not None:
+                self._db.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'memory_bytes': self.total_bytes,
+                'memory_budget': self.memory_budget,
+                'evicted_sessions': self.evicted_sessions,
+                'spill': self._db is not None,
+            }
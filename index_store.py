@@ -0,0 +1,181 @@
+"""
+Index persistant sur disque (TF-IDF + embeddings)
+Évite de réencoder la base de connaissances à chaque démarrage
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+from importlib.metadata import version, PackageNotFoundError
+
+import numpy as np
+
+from text_normalizer import NORMALIZER_VERSION
+
+# À incrémenter si le format des artefacts change
+INDEX_FORMAT_VERSION = 2
+
+DEFAULT_INDEX_DIR = os.environ.get(
+    'TUNISBOT_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_cache')
+)
+DEFAULT_KEEP_PREVIOUS = int(os.environ.get('TUNISBOT_INDEX_KEEP_PREVIOUS', 2))
+
+
+def _sklearn_version():
+    # Sans importer sklearn: un vectorizer picklé dépend de sa version
+    try:
+        return version('scikit-learn')
+    except PackageNotFoundError:
+        return None
+
+
+def knowledge_base_hash(knowledge_base, model_name):
+    """Empreinte du contenu de la base et du modèle utilisé"""
+    payload = json.dumps(
+        {'version': INDEX_FORMAT_VERSION, 'sklearn': _sklearn_version(),
+         'normalizer': NORMALIZER_VERSION,
+         'model': model_name, 'kb': knowledge_base},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+class IndexStore:
+    """Artefacts versionnés: un répertoire par empreinte
+
+    index_cache/<hash>/
+        manifest.json            # version, modèle, nombre d'entrées, hash des questions
+        tfidf.pkl                # vectorizer + matrice creuse
+        question_embeddings.npy  # chargé en mmap (pages partagées entre workers)
+
+    keep_previous: artefacts antérieurs conservés par prune() en plus de la
+    version publiée (autres workers encore sur l'ancienne base, retour arrière)
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, keep_previous=DEFAULT_KEEP_PREVIOUS):
+        self.index_dir = index_dir
+        self.keep_previous = keep_previous
+
+    def _path(self, fingerprint):
+        return os.path.join(self.index_dir, fingerprint)
+
+    def load(self, fingerprint, with_embeddings=True):
+        """Charge l'artefact s'il est valide, sinon retourne None"""
+        path = self._path(fingerprint)
+        try:
+            with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != INDEX_FORMAT_VERSION:
+                return None
+            with open(os.path.join(path, 'tfidf.pkl'), 'rb') as f:
+                vectorizer, tfidf_matrix = pickle.load(f)
+            embeddings = None
+            if with_embeddings:
+                if not manifest.get('has_embeddings'):
+                    return None
+                # Zero-copy: le noyau partage les pages entre processus
+                embeddings = np.load(os.path.join(path, 'question_embeddings.npy'), mmap_mode='r')
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        return vectorizer, tfidf_matrix, embeddings
+
+    def load_embedding_rows(self, model_name):
+        """hash de question -> embedding, depuis l'artefact le plus récent du
+        même modèle: après une modification de la base, seules les questions
+        nouvelles ou modifiées sont réencodées"""
+        try:
+            names = [name for name in os.listdir(self.index_dir) if not name.startswith('.')]
+        except OSError:
+            return {}
+        paths = sorted((self._path(name) for name in names), key=_mtime, reverse=True)
+        for path in paths:
+            try:
+                with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+                    manifest = json.load(f)
+                hashes = manifest.get('question_hashes')
+                if (manifest.get('version') != INDEX_FORMAT_VERSION or manifest.get('model') != model_name
+                        or not manifest.get('has_embeddings') or not hashes):
+                    continue
+                embeddings = np.load(os.path.join(path, 'question_embeddings.npy'), mmap_mode='r')
+            except (OSError, ValueError):
+                continue
+            if len(hashes) == embeddings.shape[0]:
+                return dict(zip(hashes, embeddings))
+        return {}
+
+    def prune(self, current):
+        """Supprime les artefacts périmés: garde current et les keep_previous
+        plus récents; retourne le nombre de répertoires supprimés"""
+        current_path = self._path(current)
+        try:
+            # Version publiée: marquée comme la plus récente
+            os.utime(current_path)
+        except OSError:
+            pass
+        try:
+            names = [name for name in os.listdir(self.index_dir) if not name.startswith('.')]
+        except OSError:
+            return 0
+        paths = sorted((self._path(name) for name in names if self._path(name) != current_path),
+                       key=_mtime, reverse=True)
+        removed = 0
+        for path in paths[self.keep_previous:]:
+            # Un worker qui lit encore l'ancien fichier en mmap garde ses pages
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def save(self, fingerprint, vectorizer, tfidf_matrix, embeddings=None, model_name=None,
+             question_hashes=None):
+        """Écriture atomique: répertoire temporaire puis renommage"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=self.index_dir)
+        try:
+            with open(os.path.join(tmp_path, 'tfidf.pkl'), 'wb') as f:
+                pickle.dump((vectorizer, tfidf_matrix), f, protocol=pickle.HIGHEST_PROTOCOL)
+            if embeddings is not None:
+                np.save(os.path.join(tmp_path, 'question_embeddings.npy'),
+                        np.ascontiguousarray(embeddings, dtype=np.float32))
+            manifest = {
+                'version': INDEX_FORMAT_VERSION,
+                'fingerprint': fingerprint,
+                'model': model_name,
+                'entries': tfidf_matrix.shape[0],
+                'has_embeddings': embeddings is not None,
+                'question_hashes': question_hashes,
+            }
+            with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            final_path = self._path(fingerprint)
+            if os.path.isdir(final_path):
+                if self.load(fingerprint, with_embeddings=embeddings is not None) is not None:
+                    # Un autre worker a déjà publié le même artefact
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    return True
+                shutil.rmtree(final_path, ignore_errors=True)
+            try:
+                os.replace(tmp_path, final_path)
+            except OSError:
+                # Publication concurrente (ENOTEMPTY): l'artefact du gagnant
+                # convient s'il est complet, et son mmap reste partagé
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if self.load(fingerprint, with_embeddings=embeddings is not None) is not None:
+                    return True
+                raise
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            print(f"⚠️ Impossible d'écrire l'index sur disque: {e}")
+            return False
+        return True
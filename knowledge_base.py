@@ -0,0 +1,138 @@
+"""
+Base de connaissances externe (JSON/JSONL) et rechargement à chaud
+Les index d'une version de la base sont regroupés dans un instantané
+immuable: un rechargement en construit un nouveau puis le publie par
+une simple affectation, sans bloquer les requêtes en cours.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_KB_PATH = os.environ.get(
+    'TUNISBOT_KB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'knowledge_base.json')
+)
+
+KB_EXTENSIONS = ('.json', '.jsonl')
+
+
+def kb_files(path=DEFAULT_KB_PATH):
+    """Fichier unique, ou fichiers .json/.jsonl d'un répertoire (ordre alphabétique)"""
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(KB_EXTENSIONS)]
+    return [path]
+
+
+def _read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [(f'{path}:{n}', json.loads(line))
+                    for n, line in enumerate(f, 1) if line.strip()]
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: une liste d'entrées est attendue")
+    return [(f'{path}[{n}]', entry) for n, entry in enumerate(entries)]
+
+
+def load_knowledge_base(path=DEFAULT_KB_PATH):
+    """Entrées {'question', 'answer', 'category'} de tous les fichiers
+
+    Lève ValueError (OSError si un fichier est illisible) plutôt que de
+    publier une base incomplète.
+    """
+    knowledge_base = []
+    for file_path in kb_files(path):
+        for where, entry in _read_entries(file_path):
+            if not isinstance(entry, dict) or not isinstance(entry.get('question'), str) \
+                    or not isinstance(entry.get('answer'), str):
+                raise ValueError(f"{where}: 'question' et 'answer' sont obligatoires")
+            knowledge_base.append(entry)
+    if not knowledge_base:
+        raise ValueError(f"{path}: base de connaissances vide")
+    return knowledge_base
+
+
+def entry_hash(question, model_name):
+    """Clé de l'embedding d'une question: ne change que si le texte ou le modèle change"""
+    return hashlib.sha256(f'{model_name}\0{question}'.encode('utf-8')).hexdigest()
+
+
+class KnowledgeIndex:
+    """Instantané d'une version de la base et de ses index
+
+    Les requêtes lisent l'instantané une seule fois et ne voient donc
+    jamais un mélange de deux versions.
+    """
+
+    def __init__(self, entries, fingerprint, model_name, tfidf_vectorizer, tfidf_matrix, tfidf_index):
+        self.entries = entries
+        self.fingerprint = fingerprint
+        self.questions = [item['question'] for item in entries]
+        self.categories = [item.get('category') for item in entries]
+        self.answer_categories = {item['answer']: item.get('category') for item in entries}
+        self.question_hashes = [entry_hash(q, model_name) for q in self.questions]
+        self.tfidf_vectorizer = tfidf_vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.tfidf_index = tfidf_index
+        self.question_embeddings = None
+        self.embedding_index = None
+
+    def with_embeddings(self, question_embeddings, embedding_index):
+        """Copie de l'instantané avec le niveau embeddings"""
+        snapshot = copy.copy(self)
+        snapshot.question_embeddings = question_embeddings
+        snapshot.embedding_index = embedding_index
+        return snapshot
+
+    def embedding_rows(self):
+        """hash de question -> embedding (réutilisable au prochain rechargement)"""
+        if self.question_embeddings is None:
+            return {}
+        return dict(zip(self.question_hashes, self.question_embeddings))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class KnowledgeBaseWatcher:
+    """Surveille les fichiers de la base (scrutation des mtime) et appelle
+    on_change quand ils changent; pas de dépendance à inotify"""
+
+    def __init__(self, path, on_change, interval=2.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._signature = self._scan()
+        self._thread = threading.Thread(target=self._run, name='tunisbot-kb-watcher', daemon=True)
+
+    def _scan(self):
+        signature = []
+        for file_path in kb_files(self.path):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+        return signature
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            signature = self._scan()
+            if signature != self._signature:
+                self._signature = signature
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"⚠️ Échec du rechargement de la base: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
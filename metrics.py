@@ -0,0 +1,191 @@
+"""
+Métriques incrémentales pour /api/stats et /metrics (format Prometheus)
+
+Chaque thread écrit dans son propre fragment (threading.local): aucun
+verrou global sur le chemin critique. La lecture agrège les fragments.
+À la fin d'un thread, son fragment est versé dans un cumul: le nombre de
+fragments reste celui des threads vivants (Flask crée un thread par requête).
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+
+# Bornes supérieures des classes de latence (ms), progression logarithmique:
+# 10 classes par décade de 0.01 ms à 100 s
+LATENCY_BOUNDS_MS = [round(0.01 * 10 ** (i / 10), 6) for i in range(71)]
+
+
+class LatencyHistogram:
+    """Histogramme à classes log fixes, fusionnable"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(LATENCY_BOUNDS_MS, value_ms)] += 1
+        self.total += 1
+        self.sum_ms += value_ms
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        self.sum_ms += other.sum_ms
+
+    def percentile(self, q):
+        """Borne supérieure de la classe contenant le quantile q (0-100)"""
+        if not self.total:
+            return 0.0
+        rank = q / 100 * self.total
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return LATENCY_BOUNDS_MS[min(i, len(LATENCY_BOUNDS_MS) - 1)]
+        return LATENCY_BOUNDS_MS[-1]
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'mean_ms': self.sum_ms / self.total if self.total else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
+
+
+class _Shard:
+    """Compteurs d'un thread"""
+
+    def __init__(self):
+        self.messages = 0
+        self.cache_hits = 0
+        self.tiers = {}
+        self.score_sums = {}
+        self.categories = {}
+        self.latency = {}
+
+    def histogram(self, name):
+        histogram = self.latency.get(name)
+        if histogram is None:
+            histogram = self.latency[name] = LatencyHistogram()
+        return histogram
+
+    def merge(self, other):
+        self.messages += other.messages
+        self.cache_hits += other.cache_hits
+        for field in ('tiers', 'score_sums', 'categories'):
+            target = getattr(self, field)
+            for key, value in dict(getattr(other, field)).items():
+                target[key] = target.get(key, 0) + value
+        for name, histogram in dict(other.latency).items():
+            self.histogram(name).merge(histogram)
+
+
+class _ShardOwner:
+    """Seule référence du thread vers son fragment: collectée à la fin du thread"""
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            # Verrou pris une seule fois par thread
+            shard = _Shard()
+            owner = self._local.owner = _ShardOwner(shard)
+            weakref.finalize(owner, self._retire, shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+        return owner.shard
+
+    def _retire(self, shard):
+        """Thread terminé: son fragment rejoint le cumul (plus aucune écriture)"""
+        with self._shards_lock:
+            self._shards.remove(shard)
+            self._retired.merge(shard)
+
+    def record(self, tier, score, category, total_ms, timings_ms=None, cache_hit=False):
+        """Appelé par chat(): O(1), sans verrou"""
+        shard = self._shard()
+        shard.messages += 1
+        shard.tiers[tier] = shard.tiers.get(tier, 0) + 1
+        shard.score_sums[tier] = shard.score_sums.get(tier, 0.0) + score
+        if category is not None:
+            shard.categories[category] = shard.categories.get(category, 0) + 1
+        if cache_hit:
+            shard.cache_hits += 1
+        shard.histogram('total').observe(total_ms)
+        for name, elapsed_ms in (timings_ms or {}).items():
+            shard.histogram(name).observe(elapsed_ms)
+
+    def _merged(self):
+        merged = _Shard()
+        with self._shards_lock:
+            shards = list(self._shards)
+            merged.merge(self._retired)
+        for shard in shards:
+            merged.merge(shard)
+        return merged
+
+    def snapshot(self):
+        merged = self._merged()
+        return {
+            'total_messages': merged.messages,
+            'cache_hits': merged.cache_hits,
+            'tiers': {
+                tier: {'count': count, 'mean_score': merged.score_sums[tier] / count}
+                for tier, count in merged.tiers.items()
+            },
+            'categories': merged.categories,
+            'latency': {name: h.summary() for name, h in merged.latency.items()},
+        }
+
+    def methods_distribution(self):
+        return dict(self._merged().tiers)
+
+    def prometheus(self):
+        """Exposition au format texte Prometheus"""
+        merged = self._merged()
+        lines = [
+            '# HELP tunisbot_messages_total Messages traités',
+            '# TYPE tunisbot_messages_total counter',
+            f'tunisbot_messages_total {merged.messages}',
+            '# HELP tunisbot_cache_hits_total Réponses servies depuis le cache',
+            '# TYPE tunisbot_cache_hits_total counter',
+            f'tunisbot_cache_hits_total {merged.cache_hits}',
+            '# HELP tunisbot_tier_selected_total Réponses par niveau de recherche',
+            '# TYPE tunisbot_tier_selected_total counter',
+        ]
+        lines += [f'tunisbot_tier_selected_total{{tier="{tier}"}} {count}'
+                  for tier, count in sorted(merged.tiers.items())]
+        lines += [
+            '# HELP tunisbot_category_total Réponses par catégorie de la base',
+            '# TYPE tunisbot_category_total counter',
+        ]
+        lines += [f'tunisbot_category_total{{category="{category}"}} {count}'
+                  for category, count in sorted(merged.categories.items())]
+        lines += [
+            '# HELP tunisbot_latency_seconds Latence par étape',
+            '# TYPE tunisbot_latency_seconds histogram',
+        ]
+        for name, histogram in sorted(merged.latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BOUNDS_MS, histogram.counts):
+                cumulative += count
+                lines.append(f'tunisbot_latency_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'tunisbot_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.total}')
+            lines.append(f'tunisbot_latency_seconds_sum{{stage="{name}"}} {histogram.sum_ms / 1000:.6f}')
+            lines.append(f'tunisbot_latency_seconds_count{{stage="{name}"}} {histogram.total}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,111 @@
+"""
+Moteur de règles compilé
+Les mots-clés littéraux de toutes les intentions sont indexés dans un
+dictionnaire de phrases parcouru en une passe sur les mots du texte; les
+motifs qui ne sont pas de simples listes de mots-clés sont fusionnés dans
+une seule expression régulière. La priorité suit l'ordre de la table.
+"""
+
+import json
+import os
+import re
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rules.json')
+
+# Motif de la forme \b(mot|autre mot|...)\b
+_KEYWORD_LIST_RE = re.compile(r'^\\b\((?P<body>[^()]*)\)\\b$')
+_LITERAL_RE = re.compile(r"^\w(?:[\w' -]*\w)?$")
+_WORD_RE = re.compile(r'\w+')
+
+
+def _literal_keywords(pattern):
+    """Mots-clés d'un motif \\b(a|b c|...)\\b, ou None s'il n'est pas littéral"""
+    m = _KEYWORD_LIST_RE.match(pattern)
+    if m is None:
+        return None
+    keywords = [alt.replace("\\'", "'").replace('\\-', '-') for alt in m.group('body').split('|')]
+    if not all(_LITERAL_RE.match(keyword) for keyword in keywords):
+        return None
+    return keywords
+
+
+class Rule:
+    def __init__(self, intent, patterns, reply):
+        self.intent = intent
+        self.patterns = patterns
+        self.reply = reply
+
+
+class RuleEngine:
+    """Intentions et réponses chargées depuis une table
+
+    Un mot-clé \\bphrase\\b apparaît dans le texte si et seulement si la
+    phrase est exactement la sous-chaîne qui va du début d'un mot à la fin
+    d'un autre: on essaie donc, pour chaque mot, les phrases de 1 à n mots
+    dans le dictionnaire (équivalent d'Aho-Corasick au niveau des mots).
+
+    Les autres motifs sont réunis dans une alternance de groupes nommés
+    placée dans une assertion avant (?=...), tentée à chaque position:
+    à une position donnée l'intention la plus prioritaire l'emporte, donc
+    le minimum sur les positions est exact.
+
+    Le résultat est la première intention (ordre de la table) dont un motif
+    apparaît dans le texte, comme l'ancienne boucle de re.search.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._phrases = {}
+        self._max_words = 0
+        alternatives = []
+        for i, rule in enumerate(self.rules):
+            regex_patterns = []
+            for pattern in rule.patterns:
+                keywords = _literal_keywords(pattern)
+                if keywords is None:
+                    regex_patterns.append(pattern)
+                    continue
+                for keyword in keywords:
+                    self._phrases.setdefault(keyword, i)
+                    self._max_words = max(self._max_words, len(_WORD_RE.findall(keyword)))
+            if regex_patterns:
+                alternatives.append(f"(?P<r{i}>{'|'.join(f'(?:{p})' for p in regex_patterns)})")
+        self._regex = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+
+    @classmethod
+    def from_table(cls, table):
+        """table: liste de {'intent', 'patterns', 'reply'} par priorité décroissante"""
+        return cls(Rule(row['intent'], list(row['patterns']), row['reply']) for row in table)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_table(json.load(f))
+
+    def _match_keywords(self, text):
+        best = None
+        if not self._phrases:
+            return best
+        spans = [m.span() for m in _WORD_RE.finditer(text)]
+        phrases = self._phrases
+        for i, (start, _) in enumerate(spans):
+            for _, end in spans[i:i + self._max_words]:
+                index = phrases.get(text[start:end])
+                if index is not None and (best is None or index < best):
+                    best = index
+                    if best == 0:
+                        return best
+        return best
+
+    def match(self, text):
+        """Règle la plus prioritaire qui s'applique au texte (déjà en minuscules), ou None"""
+        best = self._match_keywords(text)
+        if self._regex is not None and best != 0:
+            for m in self._regex.finditer(text):
+                index = int(m.lastgroup[1:])
+                if best is None or index < best:
+                    best = index
+        return self.rules[best] if best is not None else None
+
+    def __len__(self):
+        return len(self.rules)
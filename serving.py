@@ -0,0 +1,406 @@
+"""
+Service d'inférence pour le mode de production
+Pool de threads borné, limite de concurrence et délai maximal par requête
+avec repli sur règles + TF-IDF si le niveau embeddings est trop lent
+Streaming Server-Sent Events (/api/chat/stream), partagé avec Flask
+Profilage d'une requête sur demande (en-tête X-Profile + jeton d'administration)
+"""
+
+import asyncio
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from history_store import DEFAULT_SESSION
+from tracing import profiled, profiler_from_header
+
+
+class ServiceOverloaded(RuntimeError):
+    """Trop de requêtes en attente d'une place d'inférence"""
+
+
+STREAM_CHUNK_CHARS = 64
+
+
+def chunk_text(text, size=STREAM_CHUNK_CHARS):
+    """Morceaux d'environ size caractères, coupés après un mot ou une fin
+    de ligne; leur concaténation redonne exactement le texte"""
+    chunks, current = [], ''
+    for piece in re.findall(r'\S+\s*|\s+', text):
+        current += piece
+        if len(current) >= size or piece.endswith('\n'):
+            chunks.append(current)
+            current = ''
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ChatStream:
+    """Événements SSE d'une réponse en deux temps
+
+    answer  -> réponse règles/TF-IDF (ou cache), dès qu'elle est prête
+    delta   -> texte de la réponse, par morceaux
+    upgrade -> le niveau embeddings donne une autre réponse: elle remplace
+               la précédente et son texte suit en deltas
+    done    -> réponse retenue, ttfb_ms, total_ms, métadonnées
+    """
+
+    def __init__(self, bot, message, session_id=DEFAULT_SESSION, chunk_size=STREAM_CHUNK_CHARS):
+        self.bot = bot
+        self.message = message
+        self.session_id = session_id
+        self.chunk_size = chunk_size
+        self.started = time.perf_counter()
+        self.first = None
+        self.final = False
+        self.ttfb_ms = None
+
+    def _answer_events(self, event, result):
+        events = [sse_event(event, {
+            'session_id': self.session_id,
+            'method': result.method,
+            'tier': result.tier,
+            'score': round(float(result.score), 4),
+        })]
+        events += [sse_event('delta', {'text': chunk})
+                   for chunk in chunk_text(result.response, self.chunk_size)]
+        return events
+
+    def start(self):
+        """Première réponse; le délai jusqu'ici est le TTFB"""
+        self.first, self.final = self.bot.first_response(self.message)
+        events = self._answer_events('answer', self.first)
+        self.ttfb_ms = (time.perf_counter() - self.started) * 1000
+        return events
+
+    def finish(self, result):
+        """Événements de fin pour la réponse retenue; met à jour métriques et historique"""
+        upgraded = result.response != self.first.response
+        events = self._answer_events('upgrade', result) if upgraded else []
+        total_ms = (time.perf_counter() - self.started) * 1000
+        self.bot.record_exchange(self.message, result, total_ms, self.session_id,
+                                 ttfb_ms=self.ttfb_ms)
+        events.append(sse_event('done', {
+            'success': True,
+            'session_id': self.session_id,
+            'response': result.response,
+            'method': result.method,
+            'upgraded': upgraded,
+            'ttfb_ms': round(self.ttfb_ms, 3),
+            'total_ms': round(total_ms, 3),
+            'metadata': result.metadata,
+        }))
+        return events
+
+    def events(self):
+        """Générateur synchrone (Flask)"""
+        try:
+            yield from self.start()
+            result = self.first if self.final else self.bot.get_response_traced(self.message)
+            yield from self.finish(result)
+        except Exception as e:
+            # En-têtes déjà envoyés: l'erreur passe par le flux
+            yield sse_event('error', {'success': False, 'error': str(e)})
+
+
+class InferenceService:
+    """Exécute bot.get_response_details hors de la boucle asyncio
+
+    max_concurrency: inférences simultanées (au-delà, les requêtes attendent)
+    queue_timeout: attente maximale d'une place avant de refuser (503)
+    request_timeout: au-delà, on répond avec la cascade sans embeddings
+    Un calcul abandonné après expiration du délai occupe encore un thread
+    jusqu'à sa fin: il reste compté parmi les max_workers calculs en cours,
+    et quand ils sont tous pris la requête passe directement en mode dégradé.
+    Le mode dégradé (règles + TF-IDF) tourne sur un petit pool séparé
+    (fallback_workers), borné par fallback_timeout (503 au-delà): il n'attend
+    jamais derrière les embeddings lents.
+    """
+
+    def __init__(self, bot, max_workers=16, max_concurrency=8, queue_timeout=2.0,
+                 request_timeout=1.0, fallback_workers=4, fallback_timeout=0.5):
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+        self.fallback_executor = ThreadPoolExecutor(max_workers=fallback_workers,
+                                                    thread_name_prefix='inference-fallback')
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.fallback_timeout = fallback_timeout
+        self._semaphore = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.timeouts = 0
+        self.rejected = 0
+        self.saturated = 0
+
+    def _get_semaphore(self):
+        # Créé dans la boucle qui l'utilise
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _submit(self, fn, *args):
+        """Inférence complète sur le pool principal, ou None si ses threads sont
+        tous occupés (calculs abandonnés compris)"""
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_workers:
+                self.saturated += 1
+                return None
+            self._in_flight += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._task_done)
+        return asyncio.wrap_future(future)
+
+    def _task_done(self, future):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    async def _degraded(self, fn, *args):
+        """Règles + TF-IDF sur le pool de repli, dans la limite de fallback_timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.fallback_executor, fn, *args)
+        try:
+            return await asyncio.wait_for(future, timeout=self.fallback_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServiceOverloaded("Serveur surchargé, réessayez plus tard")
+
+    async def _full(self, fn, *args, timeout):
+        """Résultat de l'inférence complète, ou (None, raison) si elle n'a pas
+        de thread libre ou dépasse timeout"""
+        future = self._submit(fn, *args)
+        if future is None:
+            return None, 'saturated_fallback'
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max(timeout, 0)), None
+        except asyncio.TimeoutError:
+            # Le calcul se termine dans le pool mais son résultat est ignoré
+            self.timeouts += 1
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            return None, 'timeout_fallback'
+
+    async def chat(self, message, session_id=DEFAULT_SESSION, profiler=None):
+        """profiler: 'cprofile' ou 'sampling' pour joindre un profil de
+        l'inférence à metadata['profile'] (voir tracing.profiled)"""
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServiceOverloaded("Serveur surchargé, réessayez plus tard")
+
+        start = time.perf_counter()
+        profile = None
+        try:
+            if profiler:
+                result, fallback = await self._full(profiled, profiler, self.bot.get_response_traced,
+                                                    message, timeout=self.request_timeout)
+                if result is not None:
+                    result, profile = result
+            else:
+                result, fallback = await self._full(self.bot.get_response_traced, message,
+                                                    timeout=self.request_timeout)
+            if result is None:
+                # Embeddings trop lents ou pool saturé: réponse règles + TF-IDF
+                result = await self._degraded(self.bot.get_response_traced, message, ('embedding',))
+                result.metadata[fallback] = True
+        finally:
+            semaphore.release()
+
+        if profile is not None:
+            result.metadata['profile'] = profile
+
+        self.bot.record_exchange(message, result, (time.perf_counter() - start) * 1000, session_id)
+        return result
+
+    async def stream(self, message, session_id=DEFAULT_SESSION):
+        """Événements SSE de ChatStream; la réponse provisoire part sans
+        attendre les embeddings, qui restent soumis à request_timeout"""
+        stream = ChatStream(self.bot, message, session_id)
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServiceOverloaded("Serveur surchargé, réessayez plus tard")
+
+        try:
+            # Réponse provisoire (règles + TF-IDF) sur le pool de repli
+            for event in await self._degraded(stream.start):
+                yield event
+            result = stream.first
+            if not stream.final:
+                remaining = self.request_timeout - (time.perf_counter() - stream.started)
+                full, fallback = await self._full(self.bot.get_response_traced, message, timeout=remaining)
+                if full is None:
+                    # La réponse provisoire devient définitive
+                    result.metadata[fallback] = True
+                else:
+                    result = full
+        finally:
+            semaphore.release()
+
+        for event in stream.finish(result):
+            yield event
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'request_timeout': self.request_timeout,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'saturated': self.saturated,
+            'in_flight': self._in_flight,
+        }
+
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError('Requête trop volumineuse')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = [(b'content-type', b'application/json; charset=utf-8'),
+               (b'content-length', str(len(body)).encode())]
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _session_id(scope, session_cookie, session_header, session_id_re):
+    """Session de l'appelant et en-têtes Set-Cookie si elle vient d'être créée"""
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+               for name, value in scope.get('headers', [])}
+    session_id = headers.get(session_header.lower())
+    if not session_id and 'cookie' in headers:
+        morsel = SimpleCookie(headers['cookie']).get(session_cookie)
+        session_id = morsel.value if morsel else None
+    if session_id and session_id_re.match(session_id):
+        return session_id, []
+    session_id = uuid.uuid4().hex
+    cookie = f'{session_cookie}={session_id}; HttpOnly; Path=/; SameSite=Lax'
+    return session_id, [(b'set-cookie', cookie.encode('latin-1'))]
+
+
+def create_asgi_app(service, fallback_app=None, session_cookie='tunisbot_session',
+                    session_header='X-Session-Id', session_id_re=None, admin_token=None,
+                    admin_header='X-Admin-Token', profile_header='X-Profile'):
+    """Application ASGI: /api/chat et /api/chat/stream asynchrones, le reste vers fallback_app
+
+    admin_token: active le profilage de /api/chat par l'en-tête profile_header
+    (accompagné de admin_header); désactivé si None
+    """
+    session_id_re = session_id_re or re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+    def requested_profiler(scope):
+        """Profileur demandé par un appelant autorisé, sinon None"""
+        if not admin_token:
+            return None
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                   for name, value in scope.get('headers', [])}
+        profiler = profiler_from_header(headers.get(profile_header.lower()))
+        token = headers.get(admin_header.lower(), '').encode('latin-1')
+        if profiler and hmac.compare_digest(token, admin_token.encode('utf-8')):
+            return profiler
+        return None
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+            await chat(scope, receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/api/chat/stream' and scope['method'] == 'POST':
+            await chat_stream(scope, receive, send)
+        elif fallback_app is not None:
+            await fallback_app(scope, receive, send)
+        elif scope['type'] == 'http':
+            await _send_json(send, 404, {'success': False, 'error': 'Introuvable'})
+
+    async def read_message(receive, send):
+        """Message de la requête, ou None après avoir répondu 400"""
+        try:
+            data = json.loads(await _read_body(receive) or b'{}')
+            user_message = str(data.get('message', '')).strip()
+        except (ValueError, AttributeError) as e:
+            await _send_json(send, 400, {'success': False, 'error': str(e)})
+            return None
+        if not user_message:
+            await _send_json(send, 400, {'success': False, 'error': 'Message vide'})
+            return None
+        return user_message
+
+    async def chat(scope, receive, send):
+        session_id, cookie_headers = _session_id(scope, session_cookie, session_header, session_id_re)
+        user_message = await read_message(receive, send)
+        if user_message is None:
+            return
+
+        try:
+            result = await service.chat(user_message, session_id, requested_profiler(scope))
+        except ServiceOverloaded as e:
+            await _send_json(send, 503, {'success': False, 'error': str(e)}, [(b'retry-after', b'1')])
+            return
+        except Exception as e:
+            await _send_json(send, 500, {'success': False, 'error': str(e)})
+            return
+
+        await _send_json(send, 200, {
+            'success': True,
+            'session_id': session_id,
+            'response': result.response,
+            'method': result.method,
+            'metadata': result.metadata,
+            'timestamp': None
+        }, cookie_headers)
+
+    async def chat_stream(scope, receive, send):
+        session_id, cookie_headers = _session_id(scope, session_cookie, session_header, session_id_re)
+        user_message = await read_message(receive, send)
+        if user_message is None:
+            return
+
+        events = service.stream(user_message, session_id)
+        try:
+            first = await events.__anext__()
+        except ServiceOverloaded as e:
+            await _send_json(send, 503, {'success': False, 'error': str(e)}, [(b'retry-after', b'1')])
+            return
+        except Exception as e:
+            await _send_json(send, 500, {'success': False, 'error': str(e)})
+            return
+
+        headers = [(b'content-type', b'text/event-stream; charset=utf-8'),
+                   (b'cache-control', b'no-cache'),
+                   (b'x-accel-buffering', b'no')]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers + cookie_headers})
+        await send({'type': 'http.response.body', 'body': first.encode('utf-8'), 'more_body': True})
+        try:
+            async for event in events:
+                await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        except Exception as e:
+            # En-têtes déjà envoyés: l'erreur passe par le flux
+            error = sse_event('error', {'success': False, 'error': str(e)})
+            await send({'type': 'http.response.body', 'body': error.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    return application
@@ -0,0 +1,180 @@
+"""
+MicroBatchEncoder avec un encode_fn déterministe (sans modèle)
+"""
+
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from batch_encoder import EncoderClosed, EncoderOverloaded, MicroBatchEncoder
+
+DIM = 8
+
+
+def stub_vector(sentence):
+    """Vecteur fixe par phrase: chaque appelant peut vérifier sa ligne"""
+    rng = np.random.default_rng(zlib.crc32(sentence.encode('utf-8')))
+    return rng.standard_normal(DIM).astype(np.float32)
+
+
+class StubEncode:
+    """encode_fn bouchon: enregistre les lots; gate bloque l'encodage si fourni"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.started = threading.Event()
+        self.calls = []
+
+    def __call__(self, sentences):
+        self.calls.append(list(sentences))
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        return np.stack([stub_vector(sentence) for sentence in sentences])
+
+
+@pytest.fixture
+def make_encoder():
+    encoders = []
+
+    def make(encode_fn, **kwargs):
+        encoder = MicroBatchEncoder(encode_fn, **kwargs)
+        encoders.append(encoder)
+        return encoder
+
+    yield make
+    for encoder in encoders:
+        encoder.close()
+
+
+def test_concurrent_callers_get_their_own_rows(make_encoder):
+    encoder = make_encoder(StubEncode(), max_batch_size=8, max_wait_ms=20)
+    sentences = [f'question {i}' for i in range(32)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        rows = list(pool.map(lambda s: encoder.encode([s]), sentences))
+
+    for sentence, row in zip(sentences, rows):
+        assert row.shape == (1, DIM)
+        np.testing.assert_array_equal(row[0], stub_vector(sentence))
+    stats = encoder.stats()
+    assert stats['items'] == len(sentences)
+    assert stats['batches'] < len(sentences)
+
+
+def test_multi_sentence_call_keeps_order(make_encoder):
+    encoder = make_encoder(StubEncode(), max_wait_ms=1)
+    sentences = ['Où manger à Tunis?', 'Que voir à Carthage?', 'bonjour']
+    np.testing.assert_array_equal(encoder.encode(sentences),
+                                  np.stack([stub_vector(s) for s in sentences]))
+
+
+def test_max_batch_size_is_respected(make_encoder):
+    gate = threading.Event()
+    encode_fn = StubEncode(gate)
+    encoder = make_encoder(encode_fn, max_batch_size=4, max_wait_ms=50)
+
+    # Le premier lot bloque le thread d'encodage pendant que la file se remplit
+    first = encoder.submit('premier')
+    assert encode_fn.started.wait(timeout=2)
+    futures = [encoder.submit(f'phrase {i}') for i in range(10)]
+    gate.set()
+    for future in [first] + futures:
+        future.result(timeout=2)
+
+    stats = encoder.stats()
+    assert stats['items'] == 11
+    assert max(stats['batch_size_distribution']) <= 4
+    assert all(len(call) <= 4 for call in encode_fn.calls)
+
+
+def test_max_wait_bounds_a_lone_request(make_encoder):
+    encoder = make_encoder(StubEncode(), max_batch_size=32, max_wait_ms=50)
+    start = time.monotonic()
+    encoder.encode(['seule'])
+    elapsed = time.monotonic() - start
+    # Le lot attend au plus max_wait_ms avant de partir incomplet
+    assert 0.04 <= elapsed < 1.0
+    assert encoder.stats()['batch_size_distribution'] == {1: 1}
+
+
+def test_full_queue_raises_overloaded(make_encoder):
+    gate = threading.Event()
+    encode_fn = StubEncode(gate)
+    encoder = make_encoder(encode_fn, max_wait_ms=0, max_queue_size=1, submit_timeout=0.01)
+
+    encoder.submit('en cours')
+    assert encode_fn.started.wait(timeout=2)
+    encoder.submit('en file')
+    with pytest.raises(EncoderOverloaded):
+        encoder.encode(['refusée'])
+    assert encoder.stats()['rejected'] == 1
+    gate.set()
+
+
+def test_rejected_call_cancels_its_queued_sentences(make_encoder):
+    gate = threading.Event()
+    encode_fn = StubEncode(gate)
+    encoder = make_encoder(encode_fn, max_wait_ms=0, max_queue_size=2, submit_timeout=0.01)
+
+    blocker = encoder.submit('en cours')
+    assert encode_fn.started.wait(timeout=2)
+    with pytest.raises(EncoderOverloaded):
+        encoder.encode(['a', 'b', 'c'])
+    gate.set()
+    blocker.result(timeout=2)
+    encoder.encode(['après'])
+
+    encoded = [sentence for call in encode_fn.calls for sentence in call]
+    assert 'a' not in encoded and 'b' not in encoded
+
+
+def test_close_fails_queued_callers(make_encoder):
+    gate = threading.Event()
+    encode_fn = StubEncode(gate)
+    encoder = make_encoder(encode_fn, max_wait_ms=0)
+
+    encoder.submit('en cours')
+    assert encode_fn.started.wait(timeout=2)
+    waiting = encoder.submit('en file')
+    encoder.close(timeout=0.1)
+    with pytest.raises(EncoderClosed):
+        waiting.result(timeout=1)
+    with pytest.raises(EncoderClosed):
+        encoder.encode(['après fermeture'])
+    gate.set()
+
+
+def test_overloaded_encoder_falls_back_to_tfidf(tmp_path, make_encoder):
+    from index_store import IndexStore
+    from tunis_chatbot import TunisChatbot
+
+    class SentenceStub:
+        model_name = 'test-stub'
+
+        def encode(self, sentences, **kwargs):
+            return np.stack([stub_vector(sentence) for sentence in sentences])
+
+    bot = TunisChatbot(warmup='eager', encoder=SentenceStub(), batch_encoding=False,
+                       cascade='legacy', cache_size=0, embedding_cache_size=0,
+                       index_store=IndexStore(str(tmp_path)))
+    assert bot.embeddings_ready()
+
+    # File d'encodage saturée: un lot bloqué, la file (taille 1) pleine
+    gate = threading.Event()
+    encode_fn = StubEncode(gate)
+    bot.query_encoder = make_encoder(encode_fn, max_wait_ms=0, max_queue_size=1,
+                                     submit_timeout=0.01)
+    bot.query_encoder.submit('en cours')
+    assert encode_fn.started.wait(timeout=2)
+    bot.query_encoder.submit('en file')
+
+    assert bot.embedding_response("Où manger à Tunis?") == (None, 0, 'embedding')
+    result = bot.get_response_details("Où manger à Tunis?")
+    assert result.tier == 'tfidf'
+    assert 'embedding' in result.metadata['evaluated']
+    gate.set()
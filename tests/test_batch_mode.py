@@ -0,0 +1,29 @@
+"""
+Mode lot: stdout ne contient que du JSONL, les messages vont sur stderr
+"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Avec sentence-transformers, le mode lot chargerait le vrai modèle
+@pytest.mark.skipif(importlib.util.find_spec('sentence_transformers') is not None,
+                    reason='avertissement absent, modèle à télécharger')
+def test_batch_stdout_is_valid_jsonl(tmp_path):
+    queries = [{'id': 1, 'message': 'bonjour'}, {'id': 2, 'message': 'Où manger à Tunis?'}]
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'tunis_chatbot.py'), '--batch', '-'],
+        input=''.join(json.dumps(q, ensure_ascii=False) + '\n' for q in queries),
+        capture_output=True, text=True, check=True, cwd=ROOT,
+        env=dict(os.environ, TUNISBOT_INDEX_DIR=str(tmp_path))
+    )
+    answers = [json.loads(line) for line in out.stdout.splitlines()]
+    assert [answer['id'] for answer in answers] == [1, 2]
+    assert answers[0]['method'] == 'rule-based'
@@ -0,0 +1,73 @@
+"""
+Presets de la cascade avec des scorers bouchons
+'legacy': embeddings > 0.5 puis TF-IDF > 0.3 (ancien get_response)
+'cost': sortie anticipée quand TF-IDF dépasse 0.6
+"""
+
+import pytest
+
+from cascade import Cascade
+
+
+def make_cascade(preset, rule=None, tfidf=0.0, embedding=0.0):
+    calls = []
+
+    def scorer(name, answer, score):
+        def score_fn(user_input, threshold):
+            calls.append(name)
+            return (answer if answer is not None and score > 0 else None), score
+        return score_fn
+
+    scorers = {
+        'rule-based': scorer('rule-based', rule, 1.0 if rule else 0.0),
+        'tfidf': scorer('tfidf', 'réponse tfidf', tfidf),
+        'embedding': scorer('embedding', 'réponse embedding', embedding),
+    }
+    return Cascade.from_preset(preset, scorers, lambda user_input: 'repli'), calls
+
+
+@pytest.mark.parametrize('tfidf, embedding, tier, response', [
+    (0.4, 0.8, 'embedding', 'réponse embedding'),   # embeddings > 0.5 l'emportent sur TF-IDF > 0.3
+    (0.9, 0.51, 'embedding', 'réponse embedding'),  # même si TF-IDF est très confiant
+    (0.4, 0.5, 'tfidf', 'réponse tfidf'),           # embeddings <= 0.5: TF-IDF
+    (0.31, 0.2, 'tfidf', 'réponse tfidf'),
+    (0.3, 0.5, 'fallback', 'repli'),                # les deux sous leur seuil
+    (0.1, 0.0, 'fallback', 'repli'),
+])
+def test_legacy_thresholds(tfidf, embedding, tier, response):
+    cascade, calls = make_cascade('legacy', tfidf=tfidf, embedding=embedding)
+    result = cascade.run('question')
+    assert (result.tier, result.response) == (tier, response)
+    # Les deux niveaux sont toujours évalués
+    assert calls == ['rule-based', 'tfidf', 'embedding']
+    assert result.metadata['early_exit'] is None
+
+
+@pytest.mark.parametrize('preset', ['legacy', 'cost'])
+def test_rule_short_circuits(preset):
+    cascade, calls = make_cascade(preset, rule='bonjour!', tfidf=0.9, embedding=0.9)
+    result = cascade.run('bonjour')
+    assert (result.tier, result.response, result.method) == ('rule-based', 'bonjour!', 'rule-based')
+    assert calls == ['rule-based']
+    assert result.metadata['early_exit'] == 'rule-based'
+
+
+def test_cost_exits_early_above_0_6():
+    cascade, calls = make_cascade('cost', tfidf=0.61, embedding=0.9)
+    result = cascade.run('question')
+    assert result.tier == 'tfidf'
+    assert calls == ['rule-based', 'tfidf']
+    assert result.metadata['early_exit'] == 'tfidf'
+
+
+def test_cost_runs_embeddings_below_0_6():
+    cascade, calls = make_cascade('cost', tfidf=0.6, embedding=0.7)
+    result = cascade.run('question')
+    assert result.tier == 'embedding'
+    assert calls == ['rule-based', 'tfidf', 'embedding']
+    assert result.metadata['early_exit'] is None
+
+
+def test_cost_keeps_tfidf_when_embeddings_are_weak():
+    cascade, _ = make_cascade('cost', tfidf=0.45, embedding=0.4)
+    assert cascade.run('question').tier == 'tfidf'
@@ -0,0 +1,81 @@
+"""
+IndexStore.prune: un rechargement de la base ne laisse pas d'artefacts périmés
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from index_store import IndexStore
+from knowledge_base import load_knowledge_base
+from tunis_chatbot import TunisChatbot
+
+
+def artifacts(index_dir):
+    return sorted(name for name in os.listdir(index_dir) if not name.startswith('.'))
+
+
+def write_kb(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+
+
+def test_prune_keeps_current_and_most_recent(tmp_path):
+    store = IndexStore(str(tmp_path), keep_previous=1)
+    for i, name in enumerate(['ancien', 'precedent', 'courant', 'autre']):
+        os.makedirs(tmp_path / name)
+        os.utime(tmp_path / name, (1000 + i, 1000 + i))
+
+    assert store.prune('courant') == 2
+    assert artifacts(tmp_path) == ['autre', 'courant']
+
+
+def test_reloads_keep_a_bounded_number_of_artifacts(tmp_path):
+    kb_path = tmp_path / 'kb.json'
+    index_dir = tmp_path / 'index'
+    entries = load_knowledge_base()
+    write_kb(kb_path, entries)
+    bot = TunisChatbot(warmup='lazy', kb_path=str(kb_path),
+                       index_store=IndexStore(str(index_dir), keep_previous=2))
+
+    for i in range(5):
+        time.sleep(0.01)
+        write_kb(kb_path, entries + [{'question': f'Question ajoutée {i}?',
+                                      'answer': f'Réponse {i}', 'category': 'pratique'}])
+        assert bot.reload_knowledge_base()['changed']
+
+    remaining = artifacts(index_dir)
+    assert len(remaining) == 3
+    assert bot.index_fingerprint in remaining
+
+
+def test_losing_a_concurrent_publish_reuses_the_winner(tmp_path, monkeypatch):
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(['medina souks', 'carthage ruines'])
+    embeddings = np.eye(2, dtype=np.float32)
+    winner = IndexStore(str(tmp_path))
+    loser = IndexStore(str(tmp_path))
+
+    # Les deux workers passent le test isdir avant que l'un d'eux publie
+    real_isdir = os.path.isdir
+    monkeypatch.setattr(os.path, 'isdir', lambda path: False if path == loser._path('fp') else real_isdir(path))
+    real_replace = os.replace
+    published = []
+
+    def replace_after_winner(src, dst):
+        # Le gagnant publie juste avant le renommage du perdant
+        if not published:
+            published.append(dst)
+            assert winner.save('fp', vectorizer, matrix, embeddings, model_name='m')
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', replace_after_winner)
+    assert loser.save('fp', vectorizer, matrix, embeddings, model_name='m')
+    monkeypatch.undo()
+
+    assert artifacts(tmp_path) == ['fp']
+    loaded = loser.load('fp')
+    assert isinstance(loaded[2], np.memmap)
@@ -0,0 +1,40 @@
+"""
+MetricsRegistry: fragments par thread versés dans le cumul à la fin du thread
+"""
+
+import threading
+
+from metrics import MetricsRegistry
+
+
+def record_in_new_threads(metrics, n_threads):
+    for _ in range(n_threads):
+        thread = threading.Thread(
+            target=metrics.record, args=('tfidf', 0.5, 'lieux', 2.0), kwargs={'timings_ms': {'tfidf': 1.0}}
+        )
+        thread.start()
+        thread.join()
+
+
+def test_finished_threads_do_not_accumulate_shards():
+    metrics = MetricsRegistry()
+    record_in_new_threads(metrics, 500)
+
+    assert len(metrics._shards) == 0
+    snapshot = metrics.snapshot()
+    assert snapshot['total_messages'] == 500
+    assert snapshot['tiers']['tfidf']['count'] == 500
+    assert snapshot['categories'] == {'lieux': 500}
+    assert snapshot['latency']['tfidf']['count'] == 500
+
+
+def test_live_and_retired_shards_are_merged():
+    metrics = MetricsRegistry()
+    metrics.record('rule-based', 1.0, None, 0.1)
+    record_in_new_threads(metrics, 10)
+
+    snapshot = metrics.snapshot()
+    assert len(metrics._shards) == 1
+    assert snapshot['total_messages'] == 11
+    assert snapshot['latency']['total']['count'] == 11
+    assert 'tunisbot_messages_total 11' in metrics.prometheus()
@@ -0,0 +1,78 @@
+"""
+Cache de réponses de TunisChatbot: cohérent avec les règles et la base publiée
+"""
+
+import json
+
+import pytest
+
+from index_store import IndexStore
+from knowledge_base import load_knowledge_base
+from response_cache import LRUCache
+from tunis_chatbot import TunisChatbot
+
+
+@pytest.fixture
+def make_bot(tmp_path):
+    def make(**kwargs):
+        return TunisChatbot(warmup='lazy', index_store=IndexStore(str(tmp_path / 'index')), **kwargs)
+    return make
+
+
+@pytest.mark.parametrize('first, second', [
+    ("a bientot", "à bientôt"),
+    ("à bientôt", "a bientot"),
+    ("qui es-tu", "qui es tu"),
+    ("qui es tu", "qui es-tu"),
+])
+def test_answer_does_not_depend_on_which_variant_came_first(make_bot, first, second):
+    uncached = make_bot(cache_size=0)
+    expected = {query: uncached.get_response_details(query).tier for query in (first, second)}
+    assert uncached.normalize_query(first) == uncached.normalize_query(second)
+
+    bot = make_bot()
+    assert bot.get_response_details(first).tier == expected[first]
+    assert bot.get_response_details(second).tier == expected[second]
+    # Et de nouveau, depuis le cache cette fois pour la variante sans règle
+    assert bot.get_response_details(first).tier == expected[first]
+    assert bot.get_response_details(second).tier == expected[second]
+
+
+def test_rule_answers_differ_between_variants(make_bot):
+    bot = make_bot(cache_size=0)
+    assert bot.get_response_details("à bientôt").tier == 'rule-based'
+    assert bot.get_response_details("a bientot").tier != 'rule-based'
+
+
+def test_put_from_a_previous_generation_is_dropped():
+    cache = LRUCache(maxsize=8, ttl=None)
+    cache.bind('ancienne')
+    cache.bind('nouvelle')
+    cache.put('clé', 'valeur périmée', 'ancienne')
+    assert cache.get('clé') is None
+    cache.put('clé', 'valeur', 'nouvelle')
+    assert cache.get('clé') == 'valeur'
+    assert cache.stats()['stale_writes'] == 1
+
+
+def test_answer_computed_on_the_old_base_is_not_cached_after_reload(make_bot, tmp_path):
+    kb_path = tmp_path / 'kb.json'
+    entries = load_knowledge_base()
+    kb_path.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+    bot = make_bot(kb_path=str(kb_path))
+    question = entries[0]['question']
+    run = bot.cascade.run
+
+    def run_then_reload(user_input, **kwargs):
+        # Rechargement et nouvelle requête pendant le calcul sur l'ancienne base
+        bot.cascade.run = run
+        result = run(user_input, **kwargs)
+        updated = [dict(entries[0], answer='Nouvelle réponse')] + entries[1:]
+        kb_path.write_text(json.dumps(updated, ensure_ascii=False), encoding='utf-8')
+        assert bot.reload_knowledge_base()['changed']
+        bot.get_response_details('une autre question')
+        return result
+
+    bot.cascade.run = run_then_reload
+    assert bot.get_response_details(question).response == entries[0]['answer']
+    assert bot.get_response_details(question).response == 'Nouvelle réponse'
@@ -0,0 +1,83 @@
+"""
+InferenceService: le repli règles + TF-IDF ne dépend pas des embeddings lents
+"""
+
+import asyncio
+import threading
+import time
+
+from cascade import CascadeResult
+from serving import InferenceService
+
+
+class SlowEmbeddingBot:
+    """Niveau embeddings bloqué jusqu'à release; règles + TF-IDF immédiats"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_response_traced(self, message, skip=()):
+        if 'embedding' in skip:
+            return CascadeResult('réponse tfidf', 'tfidf (score: 0.42)', 'tfidf', 0.42, {})
+        self.release.wait(timeout=5)
+        return CascadeResult('réponse embedding', 'embedding (score: 0.80)', 'embedding', 0.8, {})
+
+    def first_response(self, message):
+        return self.get_response_traced(message, skip=('embedding',)), False
+
+    def record_exchange(self, *args, **kwargs):
+        pass
+
+
+def run_clients(service, n_requests, concurrency):
+    async def main():
+        latencies, results = [], []
+        counter = iter(range(n_requests))
+
+        async def client():
+            for _ in counter:
+                start = time.perf_counter()
+                results.append(await service.chat('Où manger à Tunis?'))
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return latencies, results
+
+    return asyncio.run(main())
+
+
+def test_abandoned_tasks_do_not_delay_the_fallback():
+    bot = SlowEmbeddingBot()
+    service = InferenceService(bot, max_workers=4, max_concurrency=8, request_timeout=0.05)
+    try:
+        latencies, results = run_clients(service, n_requests=40, concurrency=8)
+    finally:
+        bot.release.set()
+
+    assert all(result.tier == 'tfidf' for result in results)
+    # Délai + repli, jamais l'attente d'un calcul abandonné
+    assert max(latencies) < 0.5
+    stats = service.stats()
+    assert stats['timeouts'] <= 4
+    assert stats['saturated'] == 40 - stats['timeouts']
+    assert any(result.metadata.get('saturated_fallback') for result in results)
+
+
+def test_stream_uses_provisional_answer_when_pool_is_saturated():
+    bot = SlowEmbeddingBot()
+    service = InferenceService(bot, max_workers=1, request_timeout=0.05)
+
+    async def consume():
+        return [event async for event in service.stream('Où manger à Tunis?')]
+
+    try:
+        asyncio.run(consume())
+        start = time.perf_counter()
+        events = asyncio.run(consume())
+        elapsed = time.perf_counter() - start
+    finally:
+        bot.release.set()
+
+    assert elapsed < 0.5
+    assert events[-1].startswith('event: done')
+    assert '"saturated_fallback": true' in events[-1]
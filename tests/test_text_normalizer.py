@@ -0,0 +1,62 @@
+"""
+Non-régression de la recherche TF-IDF avec TextNormalizer
+Ancien index: questions brutes à l'indexation, preprocess_text à la requête
+(word_tokenize approché par split()); nouveau: même normalisation des deux côtés.
+"""
+
+import re
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from knowledge_base import load_knowledge_base
+from text_normalizer import FRENCH_STOP_WORDS, TextNormalizer
+
+# Reformulations -> question attendue de la base de connaissances
+EVAL_SET = [
+    ("Quels lieux touristiques visiter à Tunis ?", "Quels sont les principaux lieux touristiques à Tunis?"),
+    ("qu'y a-t-il à voir dans la medina", "Que voir dans la Médina de Tunis?"),
+    ("Comment on visite carthage", "Comment visiter Carthage?"),
+    ("pourquoi aller à sidi bou said", "Pourquoi visiter Sidi Bou Saïd?"),
+    ("qu'est-ce qu'on voit au musee du bardo?", "Que voir au Musée du Bardo?"),
+    ("où est-ce qu'on mange bien à Tunis", "Où manger à Tunis?"),
+    ("Quelles specialites tunisiennes faut-il gouter ?", "Quelles spécialités tunisiennes goûter?"),
+    ("où trouver de bons bricks", "Où manger des bons bricks?"),
+    ("comment se deplacer dans tunis", "Comment se déplacer à Tunis?"),
+    ("aller de l’aéroport jusqu’au centre-ville", "Comment aller de l'aéroport au centre-ville?"),
+    ("raconte l'histoire de carthage", "Quelle est l'histoire de Carthage?"),
+    ("la medina est classee unesco, pourquoi ?", "Pourquoi la Médina est-elle classée UNESCO?"),
+    ("quelle periode pour visiter tunis", "Quelle est la meilleure période pour visiter Tunis?"),
+    ("où peut-on dormir à Tunis", "Où dormir à Tunis?"),
+    ("est-ce que Tunis est sure pour un touriste", "Tunis est-elle sûre pour les touristes?"),
+    ("que faire pendant une journée", "Que faire en une journée à Tunis?"),
+    ("un weekend à tunis, que faire ?", "Que faire en un weekend à Tunis?"),
+    ("quel souvenir ramener de tunis", "Que ramener de Tunis comme souvenir?"),
+    ("une plage pres de tunis", "Où aller à la plage près de Tunis?"),
+    ("L'aéroport, c'est loin du centre ?", "Comment aller de l'aéroport au centre-ville?"),
+]
+
+
+def legacy_preprocess(text):
+    """Ancien preprocess_text"""
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return ' '.join(t for t in text.split() if t not in FRENCH_STOP_WORDS and len(t) > 2)
+
+
+def tfidf_hits(questions, fit_preprocess, query_preprocess):
+    """Nombre de reformulations dont la meilleure question TF-IDF est la bonne"""
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform([fit_preprocess(q) for q in questions])
+    queries = vectorizer.transform([query_preprocess(q) for q, _ in EVAL_SET])
+    best = (queries @ matrix.T).toarray().argmax(axis=1)
+    return sum(questions[i] == expected for i, (_, expected) in zip(best, EVAL_SET))
+
+
+def test_tfidf_retrieval_does_not_regress():
+    questions = [item['question'] for item in load_knowledge_base()]
+    normalizer = TextNormalizer()
+
+    legacy_hits = tfidf_hits(questions, lambda q: q, legacy_preprocess)
+    new_hits = tfidf_hits(questions, normalizer.normalize, normalizer.normalize)
+
+    assert new_hits >= legacy_hits
+    assert new_hits >= len(EVAL_SET) - 1
@@ -0,0 +1,82 @@
+"""
+Normalisation du texte partagée par l'indexation et les requêtes
+Tokeniseur regex précompilé, repli des accents, élisions françaises
+et filtre de mots vides (frozenset), avec mémoïsation.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Liste de mots vides français de NLTK (corpora/stopwords), embarquée pour
+# ne plus dépendre du téléchargement des ressources NLTK
+FRENCH_STOP_WORDS = (
+    "au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me "
+    "même mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te "
+    "tes toi ton tu un une vos votre vous c d j l à m n s t y été étée étées étés étant étante "
+    "étants étantes suis es est sommes êtes sont serai seras sera serons serez seront serais "
+    "serait serions seriez seraient étais était étions étiez étaient fus fut fûmes fûtes furent "
+    "sois soit soyons soyez soient fusse fusses fût fussions fussiez fussent ayant ayante "
+    "ayantes ayants eu eue eues eus ai as avons avez ont aurai auras aura aurons aurez auront "
+    "aurais aurait aurions auriez auraient avais avait avions aviez avaient eut eûmes eûtes "
+    "eurent aie aies ait ayons ayez aient eusse eusses eût eussions eussiez eussent"
+).split()
+
+# Version du traitement: entre dans l'empreinte de l'index sur disque
+NORMALIZER_VERSION = 1
+
+# Un seul parcours: l'élision éventuelle (l', qu', jusqu'...) est consommée
+# mais seul le mot qui suit est capturé
+_TOKEN_RE = re.compile(r"(?:\b(?:jusqu|lorsqu|puisqu|quoiqu|qu|[cdjlmnst])')?([^\W_]+)")
+
+
+def _strip_combining(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# Table précalculée pour le latin (À-ſ) et les apostrophes typographiques:
+# seuls les caractères non ASCII sont remplacés, sans décomposer tout le texte
+_FOLD_TABLE = {chr(cp): _strip_combining(chr(cp)) for cp in range(0xC0, 0x180)}
+_FOLD_TABLE.update({c: "'" for c in "’‘´"})
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+
+
+def _fold_char(match):
+    c = match.group()
+    folded = _FOLD_TABLE.get(c)
+    return folded if folded is not None else _strip_combining(c)
+
+
+def fold_accents(text):
+    """'Où aller à l'aéroport' -> 'Ou aller a l'aeroport'"""
+    return text if text.isascii() else _NON_ASCII_RE.sub(_fold_char, text)
+
+
+class TextNormalizer:
+    """Même traitement à l'indexation (fit) et à la requête (transform)
+
+    "Qu'est-ce qu'on mange à l'aéroport?" -> "mange aeroport"
+    """
+
+    def __init__(self, stop_words=FRENCH_STOP_WORDS, min_length=3, cache_size=65536):
+        self.stop_words = frozenset(fold_accents(w.lower()) for w in stop_words)
+        self.min_length = min_length
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+        self.key = lru_cache(maxsize=cache_size)(self._key)
+
+    def fold(self, text):
+        return fold_accents(text.lower())
+
+    def tokens(self, text):
+        """Tokens significatifs: élisions retirées, mots vides et mots courts filtrés"""
+        stop_words, min_length = self.stop_words, self.min_length
+        return [t for t in _TOKEN_RE.findall(self.fold(text))
+                if len(t) >= min_length and t not in stop_words]
+
+    def _normalize(self, text):
+        return ' '.join(self.tokens(text))
+
+    def _key(self, text):
+        """Clé de cache: mots vides conservés, élisions, accents et ponctuation repliés"""
+        return ' '.join(_TOKEN_RE.findall(self.fold(text)))
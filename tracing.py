@@ -0,0 +1,115 @@
+"""
+Traçage par étape des requêtes et profilage à la demande
+
+trace() ouvre une trace pour la requête courante; span(nom) y ajoute la
+durée d'une étape (règles, prétraitement, TF-IDF, encodage...). Hors
+trace, span() ne mesure rien. La trace suit le contexte (contextvars):
+les niveaux évalués en parallèle doivent être lancés avec copy_context().
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import importlib.util
+import io
+import pstats
+import threading
+import time
+
+_current = contextvars.ContextVar('tunisbot_trace', default=None)
+
+# 'sampling' nécessite pyinstrument (pip install pyinstrument)
+PROFILERS = ('cprofile', 'sampling')
+HAS_PYINSTRUMENT = importlib.util.find_spec('pyinstrument') is not None
+
+# Un seul profileur actif à la fois (cProfile est global à l'interpréteur)
+_profile_lock = threading.Lock()
+
+
+class Trace:
+    """Durées cumulées (ms) par étape d'une requête"""
+
+    def __init__(self):
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, elapsed_ms):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed_ms
+
+    def as_dict(self):
+        with self._lock:
+            return {name: round(elapsed_ms, 3) for name, elapsed_ms in self.spans.items()}
+
+
+@contextlib.contextmanager
+def trace():
+    """Trace de la requête courante: with trace() as current: ..."""
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Ajoute la durée du bloc à l'étape name de la trace courante"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, (time.perf_counter() - start) * 1000)
+
+
+def profiler_from_header(value):
+    """Valeur de l'en-tête X-Profile -> profileur ('cprofile', 'sampling') ou None"""
+    value = (value or '').strip().lower()
+    if value in ('1', 'true', 'yes', 'cprofile'):
+        return 'cprofile'
+    if value == 'sampling':
+        return 'sampling'
+    return None
+
+
+def profiled(profiler, fn, *args, limit=25, **kwargs):
+    """Exécute fn sous profileur; retourne (résultat, rapport)
+
+    rapport: {'profiler', 'report'} (texte des fonctions les plus coûteuses)
+    ou {'profiler', 'error'} si le profileur est indisponible ou déjà utilisé
+    par une autre requête: fn est alors exécutée normalement.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Profileur inconnu: {profiler}")
+    if profiler == 'sampling' and not HAS_PYINSTRUMENT:
+        return fn(*args, **kwargs), {'profiler': profiler, 'error': 'pyinstrument non installé'}
+    if not _profile_lock.acquire(blocking=False):
+        return fn(*args, **kwargs), {'profiler': profiler, 'error': 'profileur déjà utilisé'}
+    try:
+        if profiler == 'sampling':
+            from pyinstrument import Profiler
+
+            sampler = Profiler(interval=0.0005)
+            sampler.start()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                sampler.stop()
+            return result, {'profiler': profiler, 'report': sampler.output_text(unicode=True)}
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profile.disable()
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats('cumulative').print_stats(limit)
+        return result, {'profiler': profiler, 'report': output.getvalue()}
+    finally:
+        _profile_lock.release()
@@ -3,263 +3,513 @@ Chatbot Touristique pour Tunis - Approche Hybride
 Utilise: Règles, TF-IDF, Embeddings (Sentence-BERT)
 """
 
-import re
+import sys
 import json
+import time
+import argparse
+import contextlib
+import threading
+import importlib.util
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 
-# Téléchargement des ressources NLTK (à faire une seule fois)
-def download_nltk_resources():
-    resources = {
-        'tokenizers/punkt': 'punkt',
-        'tokenizers/punkt_tab': 'punkt_tab', 
-        'corpora/stopwords': 'stopwords'
-    }
-    
-    for path, package in resources.items():
-        try:
-            nltk.data.find(path)
-        except LookupError:
-            print(f"Téléchargement de la ressource NLTK : {package}...")
-            nltk.download(package)
+from batch_encoder import MicroBatchEncoder, EncoderOverloaded
+from index_store import IndexStore, knowledge_base_hash
+from cascade import Cascade, CascadeResult
+from response_cache import LRUCache
+from text_normalizer import TextNormalizer
+from tracing import span, trace
+from vector_index import build_index, normalize_rows
+from history_store import SessionHistoryStore, DEFAULT_SESSION
+from metrics import MetricsRegistry
+from rule_engine import RuleEngine
+from knowledge_base import (DEFAULT_KB_PATH, KnowledgeBaseWatcher, KnowledgeIndex,
+                            load_knowledge_base)
 
-download_nltk_resources()
+# scikit-learn et sentence-transformers (torch) sont importés à la
+# première utilisation: l'import de ce module reste quasi instantané.
+# La tokenisation n'utilise plus NLTK (voir text_normalizer.py).
 
 # Pour utiliser Sentence-BERT, installer: pip install sentence-transformers
-try:
-    from sentence_transformers import SentenceTransformer
-    USE_EMBEDDINGS = True
-except ImportError:
-    print("⚠️ sentence-transformers non installé. Utilisation de TF-IDF uniquement.")
-    print("Pour installer: pip install sentence-transformers")
-    USE_EMBEDDINGS = False
+USE_EMBEDDINGS = importlib.util.find_spec('sentence_transformers') is not None
+if not USE_EMBEDDINGS:
+    # Sur stderr: la sortie du mode lot (JSONL sur stdout) doit rester valide
+    print("⚠️ sentence-transformers non installé. Utilisation de TF-IDF uniquement.", file=sys.stderr)
+    print("Pour installer: pip install sentence-transformers", file=sys.stderr)
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
 
 
 class TunisChatbot:
-    def __init__(self):
-        self.stop_words = set(stopwords.words('french'))
-        self.knowledge_base = self._load_knowledge_base()
-        self.tfidf_vectorizer = TfidfVectorizer()
-        self.conversation_history = []
+    def __init__(self, batch_encoding=True, max_batch_size=32, max_wait_ms=5,
+                 index_store=None, warmup='background', cascade='cost',
+                 parallel_tiers=False, cache_size=1024, cache_ttl=3600,
+                 embedding_cache_size=4096, index_backend='exact', history_store=None,
+                 rule_engine=None, kb_path=DEFAULT_KB_PATH, watch_interval=None,
+                 embedding_precision='float32', rerank_k=0, encoder=None):
+        """warmup: 'background' (thread de préchauffage), 'eager' (bloquant)
+        ou 'lazy' (chargement déclenché par la première requête)
+        cascade: preset de seuils ('cost' ou 'legacy') ou instance de Cascade
+        index_backend: 'exact' (force brute) ou 'ivf' (approximatif) pour les embeddings
+        kb_path: fichier JSON/JSONL ou répertoire de la base de connaissances
+        watch_interval: secondes entre deux vérifications des fichiers (None = pas de surveillance)
+        embedding_precision: stockage des embeddings ('float32', 'float16' ou 'int8')
+        rerank_k: candidats rescorés en float32 (mmap) après le score compact (0 = désactivé)
+        encoder: objet avec encode(list[str]) -> array à la place de Sentence-BERT
+        (benchmarks hors ligne); son attribut model_name identifie ses embeddings"""
+        self.kb_path = kb_path
+        # Historique par session (tampons bornés, voir history_store.py)
+        self.history = history_store if history_store is not None else SessionHistoryStore()
+        self.metrics = MetricsRegistry()
+        self.index_backend = index_backend
+        self.embedding_precision = embedding_precision
+        self.rerank_k = rerank_k
+        self.batch_encoding = batch_encoding
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.encoder = encoder
+        self.use_embeddings = encoder is not None or USE_EMBEDDINGS
+        self.model_name = MODEL_NAME if encoder is None else getattr(encoder, 'model_name', type(encoder).__name__)
+        
+        # Même normalisation à l'indexation et aux requêtes (mémoïsée)
+        self.normalizer = TextNormalizer()
+        
+        # Ressources chargées à la demande
+        self.sentence_model = None
+        self.query_encoder = None
+        self._embeddings_ready = threading.Event()
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self.embedding_status = 'pending' if self.use_embeddings else 'disabled'
+        
+        # Caches: réponses par requête normalisée, embeddings des requêtes
+        self.response_cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.embedding_cache = LRUCache(maxsize=embedding_cache_size, ttl=None)
+        
+        # Index persistant: rechargé depuis le disque si la base n'a pas changé
+        self.index_store = index_store if index_store is not None else IndexStore()
+        # Instantané de la base et de ses index, remplacé d'un bloc au rechargement
+        self._reload_lock = threading.Lock()
+        self.reload_count = 0
+        self.last_reload = None
+        self.kb, _ = self._build_snapshot(self._load_knowledge_base())
+        self.index_store.prune(self.kb.fingerprint)
         
-        # Préparation TF-IDF
-        self.questions = [item['question'] for item in self.knowledge_base]
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.questions)
+        # Règles de pattern matching: table d'intentions compilée en une regex
+        self.rule_engine = rule_engine if rule_engine is not None else RuleEngine.from_file()
         
-        # Chargement du modèle d'embeddings (si disponible)
-        if USE_EMBEDDINGS:
-            print("🔄 Chargement du modèle Sentence-BERT...")
-            self.sentence_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-            self.question_embeddings = self.sentence_model.encode(self.questions)
-            print("✅ Modèle chargé avec succès!")
+        # Cascade des niveaux de recherche, du moins cher au plus cher
+        if isinstance(cascade, Cascade):
+            self.cascade = cascade
         else:
-            self.sentence_model = None
-            self.question_embeddings = None
+            self.cascade = Cascade.from_preset(
+                cascade,
+                {
+                    'rule-based': self._rule_tier,
+                    'tfidf': self.tfidf_response,
+                    'embedding': self.embedding_response,
+                },
+                self.fallback_response,
+                parallel=parallel_tiers
+            )
         
-        # Règles de pattern matching
-        self.patterns = {
-            'salutation': [r'\b(bonjour|salut|hey|hello|bonsoir)\b'],
-            'au_revoir': [r'\b(au revoir|bye|à bientôt|merci|adieu)\b'],
-            'aide': [r'\b(aide|aider|comment|commencer|que faire)\b'],
-            'nom': [r'\b(qui es-tu|ton nom|tu es qui|c\'est quoi ton nom)\b'],
-        }
+        self.kb_watcher = None
+        if watch_interval:
+            self.kb_watcher = KnowledgeBaseWatcher(
+                kb_path, self.reload_knowledge_base, interval=watch_interval
+            ).start()
+        
+        if warmup == 'eager':
+            self.warm_up()
+        elif warmup == 'background':
+            self.start_warmup()
     
-    def _load_knowledge_base(self):
-        """Base de connaissances riche sur Tunis"""
-        return [
-            # LIEUX TOURISTIQUES
-            {
-                "question": "Quels sont les principaux lieux touristiques à Tunis?",
-                "answer": "Les principaux lieux touristiques à Tunis incluent:\n- La Médina de Tunis (classée UNESCO)\n- Le site archéologique de Carthage\n- Le village de Sidi Bou Saïd\n- Le Musée National du Bardo\n- La Mosquée Zitouna\n- L'Avenue Habib Bourguiba",
-                "category": "lieux"
-            },
-            {
-                "question": "Que voir dans la Médina de Tunis?",
-                "answer": "Dans la Médina de Tunis, vous pouvez visiter:\n- La Mosquée Zitouna (la plus grande mosquée de Tunis)\n- Les souks traditionnels (parfums, tissus, bijoux)\n- Dar Lasram et autres palais ottomans\n- Les médersas historiques\n- Les portes anciennes (Bab El Bhar, Bab Souika)\nC'est un labyrinthe fascinant de ruelles étroites!",
-                "category": "lieux"
-            },
-            {
-                "question": "Comment visiter Carthage?",
-                "answer": "Pour visiter Carthage:\n- Prenez le TGM (train) depuis Tunis Marine jusqu'à Carthage Hannibal\n- Achetez un billet global pour tous les sites (environ 12 DT)\n- Sites principaux: Thermes d'Antonin, Théâtre romain, Tophet, Musée de Carthage\n- Comptez une demi-journée à une journée complète\n- Combinez avec Sidi Bou Saïd tout proche!",
-                "category": "lieux"
-            },
-            {
-                "question": "Pourquoi visiter Sidi Bou Saïd?",
-                "answer": "Sidi Bou Saïd est célèbre pour:\n- Ses maisons blanches et bleues iconiques\n- Ses ruelles pavées pittoresques\n- La vue panoramique sur la Méditerranée\n- Le Café des Nattes (thé à la menthe et pignons)\n- Les galeries d'art et boutiques d'artisanat\n- L'ambiance bohème et artistique\nC'est l'un des plus beaux villages de Tunisie!",
-                "category": "lieux"
-            },
-            {
-                "question": "Que voir au Musée du Bardo?",
-                "answer": "Le Musée National du Bardo abrite:\n- La plus grande collection de mosaïques romaines au monde\n- Des antiquités puniques et romaines\n- Des collections islamiques\n- Le célèbre baptistère de Dougga\n- Architecture magnifique dans un ancien palais beylical\nComptez 2-3 heures pour la visite. Fermé le lundi.",
-                "category": "lieux"
-            },
-            
-            # RESTAURANTS ET GASTRONOMIE
-            {
-                "question": "Où manger à Tunis?",
-                "answer": "Bonnes adresses à Tunis:\n- Dar El Jeld (cuisine traditionnelle raffinée, Médina)\n- Le Baroque (cuisine fusion, La Marsa)\n- Chez Slah (poissons, La Goulette)\n- La Closerie (française, Lac de Tunis)\n- M'rabet (pâtisseries, Avenue Habib Bourguiba)\n- Essaraya (traditionnel, Gammarth)",
-                "category": "restaurants"
-            },
-            {
-                "question": "Quelles spécialités tunisiennes goûter?",
-                "answer": "Spécialités incontournables:\n- Couscous (vendredi tradition)\n- Brik à l'œuf (feuille croustillante)\n- Tajine tunisien (différent du marocain)\n- Ojja (plat aux œufs épicé)\n- Lablabi (soupe de pois chiches)\n- Mechouia (salade grillée)\n- Makroudh et baklawa (pâtisseries)\n- Thé à la menthe et pignons",
-                "category": "gastronomie"
-            },
-            {
-                "question": "Où manger des bons bricks?",
-                "answer": "Pour déguster d'excellents bricks:\n- M'rabet (Avenue Habib Bourguiba)\n- Dans les petits restaurants de la Médina\n- Chez Slah à La Goulette\n- Au marché central\nLe brik à l'œuf est le plus populaire, mais il existe aussi au thon, aux crevettes, et à la viande.",
-                "category": "restaurants"
-            },
-            
-            # TRANSPORTS
-            {
-                "question": "Comment se déplacer à Tunis?",
-                "answer": "Moyens de transport à Tunis:\n- Métro léger (5 lignes, bon marché)\n- TGM: train de banlieue vers La Marsa/Carthage\n- Bus: réseau étendu mais souvent bondé\n- Taxis: jaunes (compteur) ou louages blancs (collectifs)\n- Uber et Bolt: disponibles\n- Location de voiture: pour plus de liberté\nLe métro est le plus pratique pour le centre-ville.",
-                "category": "transport"
-            },
-            {
-                "question": "Comment aller de l'aéroport au centre-ville?",
-                "answer": "De l'aéroport Tunis-Carthage au centre:\n- Taxi officiel: 10-15 DT (négociez avant), 20-30 min\n- Uber/Bolt: environ 10 DT\n- Bus ligne 35: très économique mais lent\n- Navette privée: réserver à l'avance\nL'aéroport est à seulement 8 km du centre-ville.",
-                "category": "transport"
-            },
-            
-            # HISTOIRE ET CULTURE
-            {
-                "question": "Quelle est l'histoire de Carthage?",
-                "answer": "Carthage, fondée par les Phéniciens en 814 av. J.-C., fut:\n- Une puissante cité-état maritime et commerciale\n- Rivale de Rome (Guerres puniques)\n- Patrie du célèbre général Hannibal\n- Détruite par Rome en 146 av. J.-C.\n- Reconstruite comme capitale romaine d'Afrique\n- Aujourd'hui site archéologique UNESCO\nUne histoire de 3000 ans!",
-                "category": "histoire"
-            },
-            {
-                "question": "Pourquoi la Médina est-elle classée UNESCO?",
-                "answer": "La Médina de Tunis est classée UNESCO car:\n- Fondée au 7ème siècle (époque islamique)\n- Architecture arabo-musulmane préservée\n- Plus de 700 monuments historiques\n- Souks et artisanat traditionnel vivant\n- Exemple exceptionnel de ville arabe médiévale\n- Centre culturel et religieux important\nC'est un patrimoine mondial depuis 1979.",
-                "category": "histoire"
-            },
-            
-            # INFORMATIONS PRATIQUES
-            {
-                "question": "Quelle est la meilleure période pour visiter Tunis?",
-                "answer": "Meilleures périodes pour visiter Tunis:\n- Printemps (mars-mai): temps doux, 18-25°C, idéal\n- Automne (septembre-novembre): agréable, moins de touristes\n- Été (juin-août): chaud (30-35°C), animation, plages\n- Hiver (décembre-février): doux mais pluvieux\nÉvitez juillet-août si vous n'aimez pas la chaleur intense.",
-                "category": "pratique"
-            },
-            {
-                "question": "Où dormir à Tunis?",
-                "answer": "Options d'hébergement:\n- Centre-ville: proche attractions, vie urbaine\n- La Marsa/Gammarth: bord de mer, calme, résidentiel\n- Sidi Bou Saïd: charme, vue, romantique\n- Médina: authentique, riads traditionnels\nBudget: auberges 15-30€, hôtels moyens 40-80€, luxe 100€+\nRéservez à l'avance en haute saison!",
-                "category": "pratique"
-            },
-            {
-                "question": "Tunis est-elle sûre pour les touristes?",
-                "answer": "Tunis est généralement sûre pour les touristes:\n- Centre-ville et zones touristiques bien sécurisés\n- Précautions habituelles: attention pickpockets (Médina, transports)\n- Éviter ruelles isolées la nuit\n- Respecter les coutumes locales\n- Police touristique disponible\nLes Tunisiens sont accueillants et hospitaliers!",
-                "category": "pratique"
-            },
-            
-            # ITINÉRAIRES
-            {
-                "question": "Que faire en une journée à Tunis?",
-                "answer": "Itinéraire d'une journée:\nMatin:\n- Médina de Tunis et Mosquée Zitouna (2h)\n- Souks et shopping artisanal (1h)\nMidi:\n- Déjeuner dans la Médina\nAprès-midi:\n- Musée du Bardo (2h)\n- Avenue Habib Bourguiba (balade)\nSoir:\n- Dîner à Sidi Bou Saïd + coucher de soleil\nAlternative: remplacer Bardo par Carthage",
-                "category": "itineraire"
-            },
-            {
-                "question": "Que faire en un weekend à Tunis?",
-                "answer": "Programme weekend (2-3 jours):\nJour 1:\n- Matin: Médina + Mosquée Zitouna\n- Après-midi: Musée du Bardo\n- Soir: Avenue Bourguiba\n\nJour 2:\n- Matin: Site de Carthage (ruines romaines)\n- Après-midi: Sidi Bou Saïd (village bleu et blanc)\n- Soir: Dîner fruits de mer à La Goulette\n\nJour 3 (optionnel):\n- Plage à Gammarth ou La Marsa\n- Shopping souvenirs",
-                "category": "itineraire"
-            },
-            
-            # SHOPPING
-            {
-                "question": "Que ramener de Tunis comme souvenir?",
-                "answer": "Souvenirs typiques de Tunis:\n- Poterie et céramique de Nabeul\n- Tapis et kilims berbères\n- Chéchia (chapeau traditionnel rouge)\n- Bijoux en argent\n- Huile d'olive tunisienne\n- Épices (harissa, ras el hanout)\n- Savon d'Alep et huile d'argan\n- Cuir et babouches\nMarchandez dans les souks (30-50% du prix initial)!",
-                "category": "shopping"
-            },
+    # Accès à l'instantané courant (compatibilité avec l'ancienne interface)
+    knowledge_base = property(lambda self: self.kb.entries)
+    questions = property(lambda self: self.kb.questions)
+    categories = property(lambda self: self.kb.categories)
+    answer_categories = property(lambda self: self.kb.answer_categories)
+    index_fingerprint = property(lambda self: self.kb.fingerprint)
+    tfidf_vectorizer = property(lambda self: self.kb.tfidf_vectorizer)
+    tfidf_matrix = property(lambda self: self.kb.tfidf_matrix)
+    tfidf_index = property(lambda self: self.kb.tfidf_index)
+    question_embeddings = property(lambda self: self.kb.question_embeddings)
+    embedding_index = property(lambda self: self.kb.embedding_index)
+    
+    def _build_snapshot(self, entries, previous=None):
+        """Index TF-IDF (et embeddings si le modèle est chargé) d'une version
+        de la base; retourne (instantané, nombre de questions encodées)"""
+        fingerprint = knowledge_base_hash(entries, self.model_name)
+        questions = [item['question'] for item in entries]
+        cached = self.index_store.load(fingerprint, with_embeddings=False)
+        
+        if cached is not None:
+            print("📦 Index TF-IDF chargé depuis le disque")
+            tfidf_vectorizer, tfidf_matrix, _ = cached
+        else:
+            # Préparation TF-IDF
+            from sklearn.feature_extraction.text import TfidfVectorizer
             
-            # PLAGES
-            {
-                "question": "Où aller à la plage près de Tunis?",
-                "answer": "Plages proches de Tunis:\n- Gammarth: plage propre, restaurants, clubs privés\n- La Marsa: populaire, ambiance familiale\n- Carthage: petites criques tranquilles\n- Raoued: plus sauvage, moins fréquentée\n- Hammamet: à 1h, stations balnéaires\nL'eau est chaude de juin à septembre (22-26°C).",
-                "category": "plages"
+            tfidf_vectorizer = TfidfVectorizer()
+            tfidf_matrix = tfidf_vectorizer.fit_transform(
+                [self.preprocess_text(q) for q in questions]
+            )
+            if not self.use_embeddings:
+                self.index_store.save(fingerprint, tfidf_vectorizer, tfidf_matrix,
+                                      model_name=self.model_name)
+        # Matrice creuse déjà normalisée L2: recherche exacte par produit scalaire
+        tfidf_index = build_index(tfidf_matrix, categories=[item.get('category') for item in entries])
+        snapshot = KnowledgeIndex(entries, fingerprint, self.model_name,
+                                  tfidf_vectorizer, tfidf_matrix, tfidf_index)
+        if self.sentence_model is None:
+            return snapshot, 0
+        return self._attach_embeddings(snapshot, previous)
+    
+    def _attach_embeddings(self, snapshot, previous=None):
+        """Embeddings des questions: artefact complet sur disque, sinon seules
+        les questions absentes de l'instantané précédent (ou du dernier
+        artefact du modèle) sont encodées"""
+        encoded = 0
+        cached = self.index_store.load(snapshot.fingerprint, with_embeddings=True)
+        if cached is not None:
+            question_embeddings = cached[2]
+        else:
+            known = previous.embedding_rows() if previous is not None else {}
+            if not known:
+                known = self.index_store.load_embedding_rows(self.model_name)
+            missing = [i for i, h in enumerate(snapshot.question_hashes) if h not in known]
+            if missing:
+                # Stockés normalisés: le score est un simple produit scalaire
+                fresh = normalize_rows(self.sentence_model.encode([snapshot.questions[i] for i in missing]))
+                known = dict(known)
+                known.update(zip([snapshot.question_hashes[i] for i in missing], fresh))
+                encoded = len(missing)
+            question_embeddings = np.stack(
+                [np.asarray(known[h], dtype=np.float32) for h in snapshot.question_hashes]
+            )
+            if self.index_store.save(snapshot.fingerprint, snapshot.tfidf_vectorizer,
+                                     snapshot.tfidf_matrix, question_embeddings,
+                                     model_name=self.model_name,
+                                     question_hashes=snapshot.question_hashes):
+                # Relecture en mmap pour partager les pages avec les autres workers
+                reloaded = self.index_store.load(snapshot.fingerprint, with_embeddings=True)
+                if reloaded is not None:
+                    question_embeddings = reloaded[2]
+        embedding_index = build_index(question_embeddings, backend=self.index_backend,
+                                      categories=snapshot.categories, normalized=True,
+                                      precision=self.embedding_precision, rerank=self.rerank_k)
+        return snapshot.with_embeddings(question_embeddings, embedding_index), encoded
+    
+    def start_warmup(self):
+        """Lance le chargement du modèle dans un thread (une seule fois)"""
+        if not self.use_embeddings:
+            return
+        with self._warmup_lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self.warm_up, name='tunisbot-warmup', daemon=True
+                )
+                self._warmup_thread.start()
+    
+    def warm_up(self):
+        """Charge le modèle Sentence-BERT et les embeddings des questions"""
+        if not self.use_embeddings or self.embedding_status in ('loading', 'ready'):
+            return
+        self.embedding_status = 'loading'
+        try:
+            if self.encoder is not None:
+                sentence_model = self.encoder
+            else:
+                from sentence_transformers import SentenceTransformer
+                
+                print("🔄 Chargement du modèle Sentence-BERT...")
+                sentence_model = SentenceTransformer(MODEL_NAME)
+            # Pas de rechargement de la base pendant le calcul des embeddings
+            with self._reload_lock:
+                self.sentence_model = sentence_model
+                try:
+                    self.kb, _ = self._attach_embeddings(self.kb)
+                except Exception:
+                    self.sentence_model = None
+                    raise
+                self.index_store.prune(self.kb.fingerprint)
+        except Exception as e:
+            print(f"⚠️ Échec du chargement des embeddings: {e}")
+            self.embedding_status = 'error'
+            return
+        
+        # Encodeur des requêtes: micro-batchs pour les appels concurrents
+        if self.batch_encoding:
+            self.query_encoder = MicroBatchEncoder(
+                sentence_model.encode,
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_wait_ms
+            )
+        else:
+            self.query_encoder = sentence_model
+        self.embedding_status = 'ready'
+        self._embeddings_ready.set()
+        print("✅ Modèle chargé avec succès!")
+    
+    def embeddings_ready(self):
+        """True dès que le niveau embeddings peut répondre"""
+        return self._embeddings_ready.is_set()
+    
+    def readiness(self):
+        """Disponibilité de chaque niveau de recherche"""
+        return {
+            'rule-based': True,
+            'tfidf': True,
+            'embedding': self.embeddings_ready(),
+            'embedding_status': self.embedding_status,
+        }
+    
+    def reload_knowledge_base(self):
+        """Relit la base, reconstruit les index hors du chemin des requêtes
+        puis publie le nouvel instantané d'un bloc
+        
+        Les requêtes en cours gardent l'instantané qu'elles ont lu; en cas
+        d'erreur (fichier invalide, encodage), l'ancienne base reste en place.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            previous = self.kb
+            try:
+                entries = self._load_knowledge_base()
+                if knowledge_base_hash(entries, self.model_name) == previous.fingerprint:
+                    snapshot, encoded = previous, 0
+                else:
+                    snapshot, encoded = self._build_snapshot(entries, previous)
+            except Exception as e:
+                print(f"⚠️ Rechargement de la base impossible: {e}")
+                self.last_reload = {
+                    'success': False,
+                    'error': str(e),
+                    'timestamp': time.time(),
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                }
+                return self.last_reload
+            self.kb = snapshot
+            self.reload_count += 1
+            # Un artefact par version de la base: on ne garde que les plus récents
+            self.index_store.prune(snapshot.fingerprint)
+            self.last_reload = {
+                'success': True,
+                'changed': snapshot is not previous,
+                'entries': len(snapshot),
+                're_encoded': encoded,
+                'fingerprint': snapshot.fingerprint,
+                'timestamp': time.time(),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
             }
-        ]
+        print(f"🔄 Base rechargée: {len(snapshot)} entrées, {encoded} réencodées "
+              f"en {self.last_reload['duration_ms']:.0f} ms")
+        return self.last_reload
+    
+    def knowledge_base_stats(self):
+        """Version publiée de la base et dernier rechargement"""
+        kb = self.kb
+        return {
+            'path': self.kb_path,
+            'entries': len(kb),
+            'fingerprint': kb.fingerprint,
+            'embeddings': kb.embedding_index.memory() if kb.embedding_index is not None else None,
+            'reloads': self.reload_count,
+            'last_reload': self.last_reload,
+            'watching': self.kb_watcher is not None,
+        }
+    
+    @property
+    def stop_words(self):
+        return self.normalizer.stop_words
+    
+    def _load_knowledge_base(self):
+        """Base de connaissances sur Tunis (data/knowledge_base.json par défaut)"""
+        return load_knowledge_base(self.kb_path)
     
     def preprocess_text(self, text):
-        """Prétraitement du texte"""
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        tokens = word_tokenize(text, language='french')
-        tokens = [t for t in tokens if t not in self.stop_words and len(t) > 2]
-        return ' '.join(tokens)
+        """Prétraitement du texte: élisions, accents, mots vides (text_normalizer.py)"""
+        with span('preprocess'):
+            return self.normalizer.normalize(text)
+    
+    def normalize_query(self, text):
+        """Clé de cache: minuscules, accents et ponctuation repliés,
+        même tokenisation que preprocess_text (mots vides conservés)"""
+        return self.normalizer.key(text)
     
     def rule_based_response(self, user_input):
         """Approche 1: Réponses basées sur des règles (pattern matching)"""
-        user_input_lower = user_input.lower()
+        with span('rules'):
+            rule = self.rule_engine.match(user_input.lower())
+        return rule.reply if rule is not None else None
+    
+    def _tfidf_vector(self, user_input, kb=None):
+        processed_input = self.preprocess_text(user_input)
+        with span('tfidf_transform'):
+            return (kb or self.kb).tfidf_vectorizer.transform([processed_input])
+    
+    def _encode_query(self, user_input):
+        """Embedding de la requête, ou None si le niveau n'est pas disponible"""
+        if not self.use_embeddings or not self.embeddings_ready():
+            # Modèle en cours de préchauffage: règles et TF-IDF répondent
+            self.start_warmup()
+            return None
         
-        for pattern_name, patterns in self.patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, user_input_lower):
-                    if pattern_name == 'salutation':
-                        return "Bonjour! Je suis votre guide touristique virtuel pour Tunis. Comment puis-je vous aider à découvrir notre belle ville?"
-                    elif pattern_name == 'au_revoir':
-                        return "Au revoir! J'espère que vous passerez un merveilleux séjour à Tunis. Bon voyage! 🌟"
-                    elif pattern_name == 'aide':
-                        return "Je peux vous aider avec:\n- Les lieux touristiques (Médina, Carthage, Sidi Bou Saïd...)\n- Les restaurants et spécialités culinaires\n- Les transports et infos pratiques\n- L'histoire et la culture\n- Des itinéraires suggérés\n\nPosez-moi une question!"
-                    elif pattern_name == 'nom':
-                        return "Je suis TunisBot, votre assistant touristique intelligent pour découvrir Tunis et ses merveilles! 🇹🇳"
-        return None
+        # Les formulations quasi identiques partagent le même embedding
+        key = self.normalize_query(user_input)
+        user_embedding = self.embedding_cache.get(key)
+        if user_embedding is None:
+            try:
+                # Inclut l'attente du micro-batch
+                with span('encode'):
+                    user_embedding = self.query_encoder.encode([user_input])
+            except EncoderOverloaded:
+                # Surcharge: on laisse TF-IDF répondre
+                return None
+            self.embedding_cache.put(key, user_embedding)
+        return user_embedding
     
     def tfidf_response(self, user_input, threshold=0.3):
         """Approche 2: Recherche par TF-IDF"""
-        processed_input = self.preprocess_text(user_input)
-        user_vector = self.tfidf_vectorizer.transform([processed_input])
-        similarities = cosine_similarity(user_vector, self.tfidf_matrix)[0]
-        
-        best_match_idx = np.argmax(similarities)
-        best_score = similarities[best_match_idx]
+        kb = self.kb
+        query = self._tfidf_vector(user_input, kb)
+        with span('tfidf_similarity'):
+            best_match_idx, best_score = kb.tfidf_index.best(query)
         
         if best_score > threshold:
-            return self.knowledge_base[best_match_idx]['answer'], best_score, 'tfidf'
+            return kb.entries[best_match_idx]['answer'], best_score, 'tfidf'
         return None, best_score, 'tfidf'
     
     def embedding_response(self, user_input, threshold=0.5):
         """Approche 3: Recherche par embeddings (Sentence-BERT)"""
-        if not USE_EMBEDDINGS or self.sentence_model is None:
+        user_embedding = self._encode_query(user_input)
+        kb = self.kb
+        if user_embedding is None or kb.embedding_index is None:
             return None, 0, 'embedding'
         
-        user_embedding = self.sentence_model.encode([user_input])
-        similarities = cosine_similarity(user_embedding, self.question_embeddings)[0]
-        
-        best_match_idx = np.argmax(similarities)
-        best_score = similarities[best_match_idx]
+        with span('embedding_similarity'):
+            best_match_idx, best_score = kb.embedding_index.best(user_embedding)
         
         if best_score > threshold:
-            return self.knowledge_base[best_match_idx]['answer'], best_score, 'embedding'
+            return kb.entries[best_match_idx]['answer'], best_score, 'embedding'
         return None, best_score, 'embedding'
     
-    def get_response(self, user_input):
-        """Approche hybride: Combine toutes les techniques"""
-        # Étape 1: Essayer les règles d'abord
-        rule_response = self.rule_based_response(user_input)
-        if rule_response:
-            return rule_response, 'rule-based'
+    def search(self, user_input, k=5, category=None, method='embedding'):
+        """Top-k des entrées de la base les plus proches, filtrables par catégorie"""
+        kb = self.kb
+        if method == 'embedding' and kb.embedding_index is not None:
+            query, index = self._encode_query(user_input), kb.embedding_index
+        else:
+            query, index = None, None
+        if query is None:
+            # Embeddings indisponibles: TF-IDF prend le relais
+            query, index = self._tfidf_vector(user_input, kb), kb.tfidf_index
+        return [
+            dict(kb.entries[idx], score=score)
+            for idx, score in index.search(query, k=k, category=category)
+        ]
+    
+    def _rule_batch(self, queries, threshold=0.0):
+        """Règles sur un lot: une passe de la regex combinée par requête"""
+        return [self._rule_tier(query) for query in queries]
+    
+    def _tfidf_batch(self, queries, threshold=0.3):
+        """TF-IDF sur un lot: un transform, un produit matriciel, argmax par ligne"""
+        kb = self.kb
+        vectors = kb.tfidf_vectorizer.transform([self.preprocess_text(q) for q in queries])
+        indices, scores = kb.tfidf_index.best_batch(vectors)
+        return [(kb.entries[idx]['answer'] if score > threshold else None, score)
+                for idx, score in zip(indices, scores)]
+    
+    def _embedding_batch(self, queries, threshold=0.5):
+        """Embeddings sur un lot: un seul encode batché"""
+        kb = self.kb
+        if not self.use_embeddings or not self.embeddings_ready() or kb.embedding_index is None:
+            self.start_warmup()
+            return [(None, 0.0)] * len(queries)
+        indices, scores = kb.embedding_index.best_batch(self.sentence_model.encode(queries))
+        return [(kb.entries[idx]['answer'] if score > threshold else None, score)
+                for idx, score in zip(indices, scores)]
+    
+    def answer_batch(self, queries):
+        """Réponses pour un lot de requêtes, sans toucher à l'historique
+        ni aux métriques (relecture de journaux, évaluation hors ligne)"""
+        queries = list(queries)
+        if not queries:
+            return []
+        return self.cascade.run_batch(queries, {
+            'rule-based': self._rule_batch,
+            'tfidf': self._tfidf_batch,
+            'embedding': self._embedding_batch,
+        })
+    
+    def _rule_tier(self, user_input, threshold=0.0):
+        """Niveau règles pour la cascade: score 1 si une règle s'applique"""
+        response = self.rule_based_response(user_input)
+        return (response, 1.0) if response else (None, 0.0)
+    
+    def get_response_details(self, user_input, skip=()):
+        """Approche hybride: cascade règles -> TF-IDF -> embeddings"""
+        if skip:
+            return self.cascade.run(user_input, skip=skip)
         
-        # Étape 2: Essayer embeddings (meilleure qualité)
-        emb_response, emb_score, _ = self.embedding_response(user_input)
+        key, generation, cached = self._cached_response(user_input)
+        if cached is not None:
+            return cached
         
-        # Étape 3: Essayer TF-IDF
-        tfidf_response, tfidf_score, _ = self.tfidf_response(user_input)
+        result = self.cascade.run(user_input)
+        # Les règles ne sont pas mises en cache: la clé replie accents et
+        # ponctuation, les règles non ("à bientôt" et "a bientot" diffèrent)
+        if key and result.tier != 'rule-based':
+            # Ignorée si la base ou le modèle ont changé pendant le calcul
+            self.response_cache.put(key, result, generation)
+        return result
+    
+    def _cached_response(self, user_input):
+        """(clé de cache, génération du cache, réponse en cache ou None)"""
+        with span('cache'):
+            # La génération change avec la base et à la fin du préchauffage
+            generation = (self.kb.fingerprint, self.embeddings_ready())
+            self.response_cache.bind(generation)
+            key = self.normalize_query(user_input)
+            cached = self.response_cache.get(key) if key else None
+        if cached is None:
+            return key, generation, None
+        # Même clé qu'une requête sans règle: le niveau règles reste prioritaire
+        if self.rule_based_response(user_input) is not None:
+            return key, generation, None
+        return key, generation, CascadeResult(cached.response, cached.method, cached.tier, cached.score,
+                                  {'cascade': self.cascade.name, 'cache': 'hit'})
+    
+    def get_response_traced(self, user_input, skip=()):
+        """get_response_details avec la durée de chaque étape (règles,
+        prétraitement, TF-IDF, encodage, similarité) dans metadata['spans_ms']"""
+        with trace() as current:
+            result = self.get_response_details(user_input, skip)
+        result.metadata['spans_ms'] = current.as_dict()
+        return result
+    
+    def first_response(self, user_input):
+        """Réponse immédiate pour le streaming: (résultat, définitif)
         
-        # Choisir la meilleure réponse
-        if emb_response and emb_score > 0.5:
-            return emb_response, f'embedding (score: {emb_score:.2f})'
-        elif tfidf_response and tfidf_score > 0.3:
-            return tfidf_response, f'tfidf (score: {tfidf_score:.2f})'
-        elif emb_response:
-            return emb_response, f'embedding-low (score: {emb_score:.2f})'
-        elif tfidf_response:
-            return tfidf_response, f'tfidf-low (score: {tfidf_score:.2f})'
-        else:
-            return self.fallback_response(user_input), 'fallback'
+        Depuis le cache si possible (définitive), sinon règles + TF-IDF
+        sans les embeddings; get_response_details donne ensuite la réponse
+        définitive, qui peut la remplacer.
+        """
+        _, _, cached = self._cached_response(user_input)
+        if cached is not None:
+            return cached, True
+        return self.cascade.run(user_input, skip=('embedding',), record=False), False
+    
+    def cache_stats(self):
+        """Statistiques des caches de réponses et d'embeddings"""
+        return {
+            'responses': self.response_cache.stats(),
+            'embeddings': self.embedding_cache.stats(),
+        }
+    
+    def get_response(self, user_input):
+        """Approche hybride: Combine toutes les techniques"""
+        return self.get_response_details(user_input).as_tuple()
     
     def fallback_response(self, user_input):
         """Réponse par défaut si aucune correspondance"""
@@ -271,19 +521,136 @@ class TunisChatbot:
                 "- L'histoire et la culture\n"
                 "- Des suggestions d'itinéraires")
     
-    def chat(self, user_input):
-        """Fonction principale de dialogue"""
-        response, method = self.get_response(user_input)
-        self.conversation_history.append({
+    @property
+    def conversation_history(self):
+        """Historique de la session par défaut (interface console)"""
+        return self.history.get(DEFAULT_SESSION)[0]
+    
+    def reset_history(self, session_id=DEFAULT_SESSION):
+        self.history.reset(session_id)
+    
+    def record_exchange(self, user_input, result, elapsed_ms, session_id=DEFAULT_SESSION,
+                        ttfb_ms=None):
+        """Met à jour les métriques et l'historique de la session
+        ttfb_ms: délai avant la première réponse envoyée (streaming)
+        Les étapes tracées (metadata['spans_ms']) sont enregistrées comme les niveaux"""
+        timings_ms = result.metadata.get('timings_ms')
+        spans_ms = result.metadata.get('spans_ms')
+        if spans_ms:
+            timings_ms = dict(timings_ms or {}, **spans_ms)
+        if ttfb_ms is not None:
+            timings_ms = dict(timings_ms or {}, ttfb=ttfb_ms)
+        self.metrics.record(
+            result.tier, result.score, self.kb.answer_categories.get(result.response),
+            elapsed_ms,
+            timings_ms=timings_ms,
+            cache_hit=result.metadata.get('cache') == 'hit'
+        )
+        self.history.append(session_id, {
             'user': user_input,
-            'bot': response,
-            'method': method
+            'bot': result.response,
+            'method': result.method
         })
-        return response, method
+    
+    def chat_details(self, user_input, session_id=DEFAULT_SESSION):
+        """Dialogue avec les métadonnées de la cascade (timings, niveau retenu)"""
+        start = time.perf_counter()
+        result = self.get_response_traced(user_input)
+        self.record_exchange(user_input, result, (time.perf_counter() - start) * 1000, session_id)
+        return result
+    
+    def chat(self, user_input, session_id=DEFAULT_SESSION):
+        """Fonction principale de dialogue"""
+        return self.chat_details(user_input, session_id).as_tuple()
+
+
+QUERY_FIELDS = ('message', 'question', 'query', 'text', 'title')
+ID_FIELDS = ('id', 'request_id')
+
+
+def _parse_query_line(line, field=None):
+    """Ligne JSONL (objet ou chaîne) ou texte brut -> (identifiant, requête)"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, line
+    if isinstance(record, str):
+        return None, record
+    if not isinstance(record, dict):
+        return None, None
+    record_id = next((record[f] for f in ID_FIELDS if f in record), None)
+    fields = (field,) if field else QUERY_FIELDS
+    query = next((record[f] for f in fields if isinstance(record.get(f), str)), None)
+    return record_id, query
+
+
+def run_batch(bot, input_file, output_file, chunk_size=256, field=None):
+    """Lit des requêtes JSONL et écrit une réponse JSONL par ligne,
+    par paquets de chunk_size (mémoire constante)"""
+    def flush(chunk):
+        results = bot.answer_batch([query for _, query in chunk])
+        for (record_id, query), result in zip(chunk, results):
+            output_file.write(json.dumps({
+                'id': record_id,
+                'query': query,
+                'answer': result.response,
+                'method': result.tier,
+                'score': round(result.score, 4),
+            }, ensure_ascii=False) + '\n')
+        output_file.flush()
+    
+    chunk = []
+    count = 0
+    for line in input_file:
+        line = line.strip()
+        if not line:
+            continue
+        record_id, query = _parse_query_line(line, field)
+        if not query:
+            continue
+        chunk.append((record_id, query))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+        count += len(chunk)
+    return count
+
+
+def batch_main(args):
+    """Mode lot: JSONL en entrée, JSONL en sortie"""
+    # Les messages de chargement vont sur stderr pour ne pas polluer la sortie
+    with contextlib.redirect_stdout(sys.stderr):
+        bot = TunisChatbot(warmup='eager')
+    input_file = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = run_batch(bot, input_file, output_file, args.chunk_size, args.field)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(f"✅ {count} requêtes traitées", file=sys.stderr)
 
 
 def main():
     """Interface en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Chatbot touristique pour Tunis")
+    parser.add_argument('--batch', metavar='FICHIER',
+                        help="répondre aux requêtes d'un fichier JSONL ('-' pour stdin)")
+    parser.add_argument('--output', default='-', metavar='FICHIER',
+                        help="fichier JSONL de sortie du mode lot ('-' pour stdout)")
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--field', help="champ contenant la requête (détecté sinon)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        batch_main(args)
+        return
+    
     print("=" * 60)
     print("🏛️  CHATBOT TOURISTIQUE - TUNIS  🇹🇳")
     print("=" * 60)
@@ -0,0 +1,313 @@
+"""
+Index vectoriels pour la recherche de questions similaires
+- ExactIndex: force brute (vecteurs normalisés, produit scalaire, argpartition)
+- IVFIndex: approximatif, partitionnement k-means en NumPy pur
+Les vecteurs denses peuvent être stockés en float16 ou int8 (QuantizedVectors).
+"""
+
+import numpy as np
+
+
+def _top_k(scores, k):
+    """Indices des k meilleurs scores, triés par score décroissant"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _is_sparse(matrix):
+    return hasattr(matrix, 'tocsr')
+
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+class QuantizedVectors:
+    """Vecteurs normalisés stockés en float16, ou en int8 avec une échelle
+    par vecteur (v ≈ scale * codes, scale = max|v| / 127)
+
+    Le score est scale_i * <codes_i, q>: produit scalaire bloc par bloc
+    (un bloc converti dans un tampon float32 réutilisé, qui reste en cache),
+    l'échelle étant appliquée au résultat; ni reconstruction de la matrice
+    ni renormalisation. NumPy convertit le float16 en logiciel: int8 est
+    à la fois plus compact et plus rapide.
+    """
+
+    def __init__(self, vectors, precision='int8', block_size=512):
+        if precision not in ('float16', 'int8'):
+            raise ValueError(f"Précision inconnue: {precision}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.precision = precision
+        self.block_size = block_size
+        if precision == 'float16':
+            self.codes = vectors.astype(np.float16)
+            self.scales = None
+        else:
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def dot(self, queries, rows=None):
+        """Scores de queries (d,) ou (m, d) contre toutes les lignes
+        (ou seulement rows): tableau (n,) ou (n, m)"""
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = self.scales if rows is None or self.scales is None else self.scales[rows]
+        queries = np.asarray(queries, dtype=np.float32)
+        out = np.empty((codes.shape[0],) + queries.shape[:-1], dtype=np.float32)
+        buffer = np.empty((min(self.block_size, codes.shape[0]), codes.shape[1]), dtype=np.float32)
+        for start in range(0, codes.shape[0], self.block_size):
+            block = codes[start:start + self.block_size]
+            np.copyto(buffer[:len(block)], block, casting='unsafe')
+            np.dot(buffer[:len(block)], queries.T, out=out[start:start + len(block)])
+        if scales is not None:
+            out *= scales.reshape((-1,) + (1,) * (out.ndim - 1))
+        return out
+
+
+class VectorIndex:
+    """Interface commune: search() retourne [(indice, score), ...]
+
+    precision: 'float32', 'float16' ou 'int8' pour les vecteurs denses
+    rerank: nombre de candidats rescorés en float32 (0 = pas de rescoring;
+    sinon la matrice float32 est conservée, idéalement en mmap)
+    """
+
+    def __init__(self, categories=None):
+        self.categories = np.asarray(categories) if categories is not None else None
+        self.vectors = None
+        self.codes = None
+        self.precision = 'float32'
+        self.rerank = 0
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def _init_storage(self, vectors, precision, rerank):
+        """vectors: vecteurs normalisés float32"""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Précision inconnue: {precision}")
+        self.precision = precision
+        self.vectors = vectors
+        if precision != 'float32':
+            self.codes = QuantizedVectors(vectors, precision)
+            self.rerank = rerank
+            if not rerank:
+                # La matrice float32 n'est plus nécessaire
+                self.vectors = None
+
+    def _score_rows(self, query, rows=None):
+        """Scores de la requête normalisée (toutes les lignes ou rows)"""
+        if self.codes is not None:
+            return self.codes.dot(query, rows)
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        return np.asarray(vectors @ query)
+
+    def _rescore(self, candidates, scores, query, k):
+        """Top-k; avec rerank, les meilleurs candidats approchés sont rescorés en float32"""
+        if self.rerank and self.vectors is not None:
+            # Lignes lues dans l'ordre du fichier (mmap)
+            candidates = np.sort(candidates[_top_k(scores, max(k, self.rerank))])
+            scores = np.asarray(self.vectors[candidates] @ query)
+        return [(int(candidates[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+    def memory(self):
+        """Empreinte mémoire du stockage des vecteurs"""
+        n, dim = (self.codes if self.codes is not None else self.vectors).shape
+        if self.codes is not None:
+            total = self.codes.nbytes
+        else:
+            total = n * dim * np.dtype(np.float32).itemsize
+        return {
+            'precision': self.precision,
+            'entries': n,
+            'dim': dim,
+            'bytes_per_entry': total / n if n else 0.0,
+            'total_bytes': total,
+            'rerank': self.rerank,
+        }
+
+    def _category_mask(self, category):
+        if category is None or self.categories is None:
+            return None
+        wanted = [category] if isinstance(category, str) else list(category)
+        return np.isin(self.categories, wanted)
+
+    def search(self, query, k=1, category=None):
+        raise NotImplementedError
+
+    def best(self, query, category=None):
+        """Meilleur résultat (indice, score), ou (None, 0.0) si l'index est vide"""
+        results = self.search(query, k=1, category=category)
+        return results[0] if results else (None, 0.0)
+
+    def best_batch(self, queries):
+        """Meilleur résultat pour chaque ligne de queries: (indices, scores)"""
+        n_queries = queries.shape[0]
+        indices = np.zeros(n_queries, dtype=np.int64)
+        scores = np.zeros(n_queries, dtype=np.float32)
+        for row in range(n_queries):
+            idx, score = self.best(queries[row])
+            if idx is not None:
+                indices[row], scores[row] = idx, score
+        return indices, scores
+
+
+class ExactIndex(VectorIndex):
+    """Recherche exhaustive par produit scalaire
+
+    Les vecteurs denses sont normalisés une fois pour toutes (float32,
+    float16 ou int8): le score est directement la similarité cosinus.
+    Les matrices creuses TF-IDF sont déjà normalisées L2 par le vectorizer.
+    """
+
+    def __init__(self, vectors, categories=None, normalized=False, precision='float32', rerank=0):
+        super().__init__(categories)
+        self._n = vectors.shape[0]
+        if _is_sparse(vectors):
+            self.vectors = vectors.tocsr()
+        else:
+            # Pas de copie si déjà normalisés: un tableau mmap reste partagé entre workers
+            self._init_storage(vectors if normalized else normalize_rows(vectors), precision, rerank)
+
+    def __len__(self):
+        return self._n
+
+    def scores(self, query):
+        """Similarité de la requête avec toutes les entrées"""
+        if _is_sparse(self.vectors):
+            return np.asarray((self.vectors @ query.T).todense()).ravel()
+        return self._score_rows(normalize_rows(np.asarray(query).reshape(1, -1))[0])
+
+    def best_batch(self, queries):
+        """Un seul produit matriciel pour tout le lot, argmax par ligne"""
+        if _is_sparse(self.vectors):
+            scores = np.asarray((queries @ self.vectors.T).todense())
+        else:
+            queries = normalize_rows(queries)
+            scores = self._score_rows(queries).T if self.codes is not None \
+                else np.asarray(queries @ np.asarray(self.vectors).T)
+        if scores.shape[1] == 0:
+            return np.zeros(scores.shape[0], dtype=np.int64), np.zeros(scores.shape[0], dtype=np.float32)
+        rows = np.arange(scores.shape[0])
+        if self.rerank and self.vectors is not None:
+            # Rescoring float32 des meilleurs candidats de chaque requête
+            r = min(self.rerank, scores.shape[1])
+            candidates = np.argpartition(-scores, r - 1, axis=1)[:, :r]
+            full = np.asarray(self.vectors[candidates.ravel()]).reshape(candidates.shape + (-1,))
+            exact = np.einsum('md,mrd->mr', queries, full)
+            best = np.argmax(exact, axis=1)
+            return candidates[rows, best], exact[rows, best]
+        indices = np.argmax(scores, axis=1)
+        return indices, scores[rows, indices]
+
+    def search(self, query, k=1, category=None):
+        if not _is_sparse(self.vectors):
+            query = normalize_rows(np.asarray(query).reshape(1, -1))[0]
+            scores = self._score_rows(query)
+        else:
+            scores = self.scores(query)
+        mask = self._category_mask(category)
+        if mask is None:
+            return self._rescore(np.arange(self._n), scores, query, k)
+        candidates = np.flatnonzero(mask)
+        return self._rescore(candidates, scores[candidates], query, k)
+
+
+class IVFIndex(VectorIndex):
+    """Index inversé (IVF): k-means sphérique puis scan des nprobe listes
+    les plus proches de la requête. Vecteurs denses uniquement."""
+
+    def __init__(self, vectors, categories=None, normalized=False, n_lists=None,
+                 nprobe=8, n_iter=10, seed=0, precision='float32', rerank=0):
+        super().__init__(categories)
+        # Apprentissage des centroïdes en float32, puis stockage compact
+        self.vectors = vectors if normalized else normalize_rows(vectors)
+        n = self._n = self.vectors.shape[0]
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.nprobe = nprobe
+        self.centroids, assignments = self._train(n_iter, seed)
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+        self._init_storage(self.vectors, precision, rerank)
+
+    def __len__(self):
+        return self._n
+
+    def _assign(self, centroids, chunk_size=8192):
+        n = self.vectors.shape[0]
+        assignments = np.empty(n, dtype=np.int64)
+        for start in range(0, n, chunk_size):
+            block = np.asarray(self.vectors[start:start + chunk_size])
+            assignments[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _train(self, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        n = self.vectors.shape[0]
+        centroids = np.array(self.vectors[rng.choice(n, self.n_lists, replace=False)], dtype=np.float32)
+        assignments = self._assign(centroids)
+        for _ in range(n_iter):
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=self.n_lists)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(np.asarray(self.vectors)[order], starts[~empty], axis=0)
+            # Liste vide: on la réinitialise sur un point au hasard
+            sums[empty] = self.vectors[rng.choice(n, int(empty.sum()))]
+            centroids = normalize_rows(sums)
+            new_assignments = self._assign(centroids)
+            if np.array_equal(new_assignments, assignments):
+                break
+            assignments = new_assignments
+        return centroids, assignments
+
+    def search(self, query, k=1, category=None, nprobe=None):
+        query = normalize_rows(np.asarray(query).reshape(1, -1))[0]
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        probed = _top_k(self.centroids @ query, nprobe)
+        candidates = np.concatenate([self.lists[i] for i in probed])
+        mask = self._category_mask(category)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if candidates.size == 0:
+            return []
+        return self._rescore(candidates, self._score_rows(query, candidates), query, k)
+
+
+INDEX_BACKENDS = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_index(vectors, backend='exact', categories=None, normalized=False, **kwargs):
+    """Construit un index; les matrices creuses utilisent toujours la force brute"""
+    if _is_sparse(vectors):
+        return ExactIndex(vectors, categories=categories)
+    return INDEX_BACKENDS[backend](vectors, categories=categories, normalized=normalized, **kwargs)